@@ -12,8 +12,9 @@ import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Union
 
+import numpy as np
 import pandas as pd
 
 # Reuse helpers and shared logic
@@ -26,11 +27,16 @@ import create_energy_assets as prep  # type: ignore  # noqa: E402
 import mappings  # type: ignore  # noqa: E402
 
 EI_ELEC_SHEET = "Elec generation by fuel"
+FUEL_ORDER = tuple(sorted(set(mappings.EI_ELEC_FUEL_MAP.values())))
+# Aggregate/region rows to skip; built once so str.startswith gets a ready tuple
+BLACKLIST_PREFIXES = tuple(sorted(mappings.EI_ELEC_BLACKLIST_PREFIXES))
 
 
 def _load_un_base(path: Path) -> dict:
     if not path.exists():
         raise FileNotFoundError(f"UN JSON not found: {path}")
+    if prep.orjson is not None:
+        return prep.orjson.loads(path.read_bytes())
     return json.loads(path.read_text())
 
 
@@ -51,19 +57,41 @@ def _extract_name_lookup(un_obj: dict) -> Dict[str, tuple[str, str]]:
     return lookup
 
 
+def _code_lookup_series(
+    name_lookup: Dict[str, tuple[str, str]], alias_map: Dict[str, str]
+) -> pd.Series:
+    """
+    Lowercase EI label -> UN economy code, with aliases folded in.
+    Direct name matches take precedence over aliases.
+    """
+    codes = {key: code for key, (code, _) in name_lookup.items()}
+    aliased = {alias: codes[target] for alias, target in alias_map.items() if target in codes}
+    return pd.Series({**aliased, **codes}, dtype=object)
+
+
+def _load_ei_sheet(workbook: Path, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Read the EI electricity-by-fuel sheet with an `economy` label column.
+    The sheet is cached to Parquet next to the workbook (prep._read_excel_cached).
+    """
+    df = prep._read_excel_cached(workbook, sheet_name=EI_ELEC_SHEET, use_cache=use_cache, header=2)
+    df = df.rename(columns={df.columns[0]: "economy"})
+    return df.dropna(subset=["economy"])
+
+
 def _extract_ei_electricity(
-    workbook: Path, name_lookup: Dict[str, tuple[str, str]]
+    ei_source: Union[Path, pd.DataFrame],
+    name_lookup: Dict[str, tuple[str, str]],
+    use_cache: bool = True,
 ) -> Dict[str, List[Dict[str, float]]]:
     """
     Parse EI electricity-by-fuel sheet (base columns = 2023) and return
     {econ_code: [{fuel, value}, ...]} with PJ values, mapped to UN codes.
+    ei_source is the workbook path or a sheet already read by _load_ei_sheet.
     """
-    df = pd.read_excel(workbook, sheet_name=EI_ELEC_SHEET, header=2)
-    df = df.rename(columns={df.columns[0]: "economy"})
-    df = df.dropna(subset=["economy"])
+    df = ei_source if isinstance(ei_source, pd.DataFrame) else _load_ei_sheet(ei_source, use_cache)
 
     # Filter out obvious aggregates/regions
-    blacklist_prefixes = tuple(mappings.EI_ELEC_BLACKLIST_PREFIXES)
     alias_map = mappings.EI_NAME_ALIASES
     fuel_map = mappings.EI_ELEC_FUEL_MAP
 
@@ -71,25 +99,38 @@ def _extract_ei_electricity(
     if not fuel_cols:
         raise RuntimeError("No expected fuel columns found in EI electricity sheet")
 
+    labels = df["economy"].astype(str).str.strip()
+    keys = labels.str.lower()
+    codes = keys.map(_code_lookup_series(name_lookup, alias_map))
+    keep = (labels != "") & ~labels.str.startswith(BLACKLIST_PREFIXES) & codes.notna()
+
+    # Accumulate TWh columns into fuel buckets (PJ) as one float64 matrix product
+    mapped = {fuel_map[col] for col in fuel_cols}
+    fuels = [fuel for fuel in FUEL_ORDER if fuel in mapped]
+    bucket = np.zeros((len(fuel_cols), len(fuels)))
+    bucket[np.arange(len(fuel_cols)), [fuels.index(fuel_map[col]) for col in fuel_cols]] = 1.0
+    values = (
+        df.loc[keep, fuel_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        * 3.6
+    )
+    present = ~np.isnan(values)
+    totals = np.where(present, values, 0.0) @ bucket
+    has_fuel = (present @ bucket) > 0
+
+    # Skip rows without values; among the rest the last label per economy wins
+    with_data = has_fuel.any(axis=1)
+    row_codes = codes[keep].to_numpy()[with_data]
+    last = ~pd.Index(row_codes).duplicated(keep="last")
+    # Values stay in the float64 matrix until emitted; tolist() converts them in one pass
     out: Dict[str, List[Dict[str, float]]] = {}
-    for _, row in df.iterrows():
-        econ_label = str(row["economy"]).strip()
-        if not econ_label or econ_label.startswith(blacklist_prefixes):
-            continue
-        key = econ_label.lower()
-        match = name_lookup.get(key) or name_lookup.get(alias_map.get(key, ""))
-        if not match:
-            continue
-        econ_code, _ = match
-        fuels: Dict[str, float] = {}
-        for raw in fuel_cols:
-            val = pd.to_numeric(row[raw], errors="coerce")
-            if pd.isna(val):
-                continue
-            fuels[fuel_map[raw]] = fuels.get(fuel_map[raw], 0.0) + float(val) * 3.6
-        if not fuels:
-            continue
-        out[econ_code] = [{"fuel": f, "value": v} for f, v in sorted(fuels.items())]
+    for econ_code, row_totals, row_has in zip(
+        row_codes[last], totals[with_data][last].tolist(), has_fuel[with_data][last].tolist()
+    ):
+        out[econ_code] = [
+            {"fuel": fuel, "value": val}
+            for fuel, val, has in zip(fuels, row_totals, row_has)
+            if has
+        ]
     return out
 
 
@@ -100,44 +141,41 @@ def _overlay_electricity(
 ) -> Dict[str, dict]:
     """
     Replace electricity generation with EI values and drop economies without EI data.
+    Updates the year datasets and their profiles in place (no per-profile copies).
     """
-    updated: Dict[str, dict] = {}
-    for year_str, data in datasets.items():
+    for data in datasets.values():
         profiles_out: List[Dict] = []
         for profile in data.get("profiles", []):
             econ = profile.get("economy")
             if econ not in ei_elec:
                 continue
-            sectors = dict(profile.get("sectors", {}))
-            sectors["18_electricity_output_in_gwh"] = ei_elec[econ]
-            new_profile = {
-                **profile,
-                "source": "UN+EI (elec 2023)",
-                "sectors": sectors,
-            }
-            new_profile.pop("metrics", None)
-            new_profile = prep._attach_metrics(new_profile, exports_negative=True)
-            prep._validate_metrics(new_profile)
-            profiles_out.append(new_profile)
-        updated[year_str] = {
-            **data,
-            "profiles": profiles_out,
-            "scenario": scenario_label,
-        }
-    return updated
+            profile["source"] = "UN+EI (elec 2023)"
+            profile.setdefault("sectors", {})["18_electricity_output_in_gwh"] = ei_elec[econ]
+            profile.pop("metrics", None)
+            prep._finalize_metrics(profile, exports_negative=True)
+            profiles_out.append(profile)
+        data["profiles"] = profiles_out
+        data["scenario"] = scenario_label
+    return datasets
 
 
 def combine_un_with_ei(
-    un_json: Path,
-    ei_workbook: Path,
+    un_json: Union[Path, dict],
+    ei_workbook: Union[Path, pd.DataFrame],
     output_json: Path,
     scenario_label: str = "UN (2010/2020) + EI electricity (2023)",
+    use_cache: bool = True,
 ) -> int:
-    un_obj = _load_un_base(un_json)
+    """
+    Write the UN+EI JSON and shards; returns the number of profiles kept.
+    un_json may be the UN payload itself (e.g. prep.build_un_profiles), which is overlaid in place.
+    """
+    un_obj = un_json if isinstance(un_json, dict) else _load_un_base(un_json)
     name_lookup = _extract_name_lookup(un_obj)
-    ei_elec = _extract_ei_electricity(ei_workbook, name_lookup)
+    ei_elec = _extract_ei_electricity(ei_workbook, name_lookup, use_cache=use_cache)
 
-    datasets = _overlay_electricity(dict(un_obj.get("datasets", {})), ei_elec, scenario_label)
+    # un_obj is not reused, so its datasets are overlaid in place
+    datasets = _overlay_electricity(un_obj.get("datasets", {}), ei_elec, scenario_label)
     years = sorted({int(y) for y in datasets.keys()})
     default_year = un_obj.get("defaultYear", years[-1] if years else None) or years[-1]
     combined = {
@@ -148,7 +186,7 @@ def combine_un_with_ei(
     }
 
     output_json.parent.mkdir(parents=True, exist_ok=True)
-    output_json.write_text(json.dumps(combined, indent=2))
+    prep._dump_json(combined, output_json)
     prep._write_group_shards(combined, output_json)
     print(f"[INFO] Wrote combined UN+EI dataset to {output_json} (profiles_with_elec={len(ei_elec)})")
     return sum(len(d.get("profiles", [])) for d in datasets.values())
@@ -14,11 +14,10 @@ python scripts/create_ei_assets.py \\
 from __future__ import annotations
 
 import argparse
-import json
 import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Mapping
+from typing import Dict, Iterator, List, Mapping
 
 import pandas as pd
 
@@ -50,26 +49,32 @@ ELEC_FUEL_MAP: Mapping[str, str] = {
     "Other#": "renewables_and_others",
 }
 
+# Canonical (alphabetical) output order for every fuel either sheet can produce
+FUEL_ORDER = tuple(sorted(set(SUPPLY_FUEL_MAP.values()) | set(ELEC_FUEL_MAP.values())))
+
 # The EI "by fuel" sheets publish 2023 in the base columns and 2024 in the ".1"
 # suffixed columns. Keep both so the app can offer a year toggle.
 YEAR_SUFFIXES: Mapping[int, str] = {2023: "", 2024: ".1"}
 
 
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+
+
 def _slugify_economy(name: str) -> str:
     """
     Turn free-text economy names into stable codes.
     """
-    slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+    slug = _SLUG_RE.sub("_", name).strip("_")
     return f"EI_{slug.upper()}"
 
 
 def _read_by_fuel_sheet(
-    workbook: Path,
+    workbook: pd.ExcelFile,
     sheet: str,
     fuel_map: Mapping[str, str],
     unit_to_pj: float,
     year_suffixes: Mapping[int, str],
-) -> Dict[int, Dict[str, Dict[str, float]]]:
+) -> tuple[pd.DataFrame, Dict[str, str]]:
     """
     Parse an EI sheet with the common layout:
     - title row
@@ -77,7 +82,8 @@ def _read_by_fuel_sheet(
     - header row with fuels (row index 2 when 0-based)
     - blank spacer
     - data rows
-    Returns {year: {economy_code: {fuel: value_pj}}}
+    Returns (long frame with year/economy/fuel/value_pj columns, {economy_code: name}).
+    Values stay NaN where the sheet has no number so every economy keeps its rows.
     """
     df = pd.read_excel(workbook, sheet_name=sheet, header=2)
     if df.empty:
@@ -88,72 +94,66 @@ def _read_by_fuel_sheet(
     df = df.rename(columns={first_col: "economy"})
     df = df.dropna(subset=["economy"])
 
-    # Keep only columns we know how to map
-    columns_needed: set[str] = set()
-    for raw in fuel_map.keys():
-        for suffix in year_suffixes.values():
-            col = raw + suffix
-            if col in df.columns:
-                columns_needed.add(col)
     missing = [c for c in fuel_map.keys() if all((c + suf) not in df.columns for suf in year_suffixes.values())]
     if missing:
         raise RuntimeError(f"Missing expected columns in {sheet}: {missing}")
-    keep_cols = ["economy"] + sorted(columns_needed)
-    df = df[keep_cols]
 
-    out: Dict[int, Dict[str, Dict[str, float]]] = {year: {} for year in year_suffixes.keys()}
-    for _, row in df.iterrows():
-        econ_label = str(row["economy"]).strip()
-        if not econ_label:
+    labels = df["economy"].astype(str).str.strip()
+    labels = labels[labels != ""]
+    df = df.loc[labels.index].assign(economy=labels.map(_slugify_economy))
+    # Prettified name per code (last label wins, used later when building profiles)
+    names = dict(zip(df["economy"], labels))
+
+    frames: List[pd.DataFrame] = []
+    for year, suffix in year_suffixes.items():
+        col_fuels = {raw + suffix: mapped for raw, mapped in fuel_map.items() if raw + suffix in df.columns}
+        if not col_fuels:
             continue
-        econ_code = _slugify_economy(econ_label)
-        for year, suffix in year_suffixes.items():
-            fuels: Dict[str, float] = out.setdefault(year, {}).setdefault(econ_code, {})
-            for raw, mapped in fuel_map.items():
-                col = raw + suffix
-                if col not in row:
-                    continue
-                val = pd.to_numeric(row[col], errors="coerce")
-                if pd.isna(val):
-                    continue
-                fuels[mapped] = float(val) * unit_to_pj + fuels.get(mapped, 0.0)
-        # Store the prettified name once (used later when building profiles)
-        out.setdefault(-1, {})[econ_code] = {"name": econ_label}  # sentinel bucket
-    return out
+        part = df[["economy", *col_fuels]].melt(id_vars="economy", var_name="column")
+        part["year"] = year
+        part["fuel"] = part["column"].map(col_fuels)
+        part["value"] = pd.to_numeric(part["value"], errors="coerce") * unit_to_pj
+        frames.append(part[["year", "economy", "fuel", "value"]])
+    if not frames:
+        return pd.DataFrame(columns=["year", "economy", "fuel", "value"]), names
+    return pd.concat(frames, ignore_index=True), names
 
 
 def _merge_sector_data(
-    supply: Dict[int, Dict[str, Dict[str, float]]],
-    elec: Dict[int, Dict[str, Dict[str, float]]],
+    supply: pd.DataFrame,
+    elec: pd.DataFrame,
 ) -> Dict[int, Dict[str, Dict[str, List[Dict[str, float]]]]]:
     """
-    Combine sector maps from supply and electricity into the shape expected by the app.
+    Combine long supply and electricity frames into the shape expected by the app.
     """
-    years = set(supply.keys()) | set(elec.keys())
-    years.discard(-1)  # sentinel bucket used for names
-
-    by_year: Dict[int, Dict[str, Dict[str, List[Dict[str, float]]]]] = {}
-    for year in years:
-        sector_map: Dict[str, Dict[str, List[Dict[str, float]]]] = {}
-        economies = set()
-        if year in supply:
-            economies.update(supply[year].keys())
-        if year in elec:
-            economies.update(elec[year].keys())
-        for econ in economies:
-            sectors: Dict[str, List[Dict[str, float]]] = {}
-            if year in supply and econ in supply[year]:
-                sectors["07_total_primary_energy_supply"] = [
-                    {"fuel": fuel, "value": val} for fuel, val in sorted(supply[year][econ].items())
-                ]
-            if year in elec and econ in elec[year]:
-                sectors["18_electricity_output_in_gwh"] = [
-                    {"fuel": fuel, "value": val} for fuel, val in sorted(elec[year][econ].items())
-                ]
-            if sectors:
-                sector_map[econ] = sectors
-        by_year[year] = sector_map
-    return by_year
+    combined = pd.concat(
+        [
+            supply.assign(sector="07_total_primary_energy_supply"),
+            elec.assign(sector="18_electricity_output_in_gwh"),
+        ],
+        ignore_index=True,
+    )
+    # min_count keeps all-NaN groups as NaN: the sector is present but has no value for that fuel
+    totals = combined.groupby(["year", "economy", "sector", "fuel"], sort=False)["value"].sum(
+        min_count=1
+    )
+
+    fuel_values: Dict[int, Dict[str, Dict[str, Dict[str, float]]]] = {}
+    for (year, econ, sector, fuel), val in totals.items():
+        fuels = fuel_values.setdefault(int(year), {}).setdefault(econ, {}).setdefault(sector, {})
+        if pd.notna(val):
+            fuels[fuel] = float(val)
+
+    return {
+        year: {
+            econ: {
+                sector: [{"fuel": fuel, "value": fuels[fuel]} for fuel in FUEL_ORDER if fuel in fuels]
+                for sector, fuels in sectors.items()
+            }
+            for econ, sectors in sector_map.items()
+        }
+        for year, sector_map in fuel_values.items()
+    }
 
 
 def generate_ei_assets(
@@ -162,66 +162,58 @@ def generate_ei_assets(
     supply_sheet: str = "TES by fuel",
     elec_sheet: str = "Elec generation by fuel",
     scenario: str = "historical",
+    ndjson_shards: bool = False,
 ) -> int:
     """
     Extract EI workbook data into the app JSON structure (currently 2023 & 2024 only).
+    With ndjson_shards=True, each shard also gets a line-delimited .ndjson copy.
     """
     if not workbook.exists():
         raise FileNotFoundError(f"Workbook not found: {workbook}")
 
-    supply_raw = _read_by_fuel_sheet(
-        workbook,
-        sheet=supply_sheet,
-        fuel_map=SUPPLY_FUEL_MAP,
-        unit_to_pj=1000.0,  # EJ -> PJ
-        year_suffixes=YEAR_SUFFIXES,
-    )
-    elec_raw = _read_by_fuel_sheet(
-        workbook,
-        sheet=elec_sheet,
-        fuel_map=ELEC_FUEL_MAP,
-        unit_to_pj=3.6,  # TWh -> PJ
-        year_suffixes=YEAR_SUFFIXES,
-    )
-
-    # Extract names from the sentinel bucket
-    names: Dict[str, str] = {}
-    for source in (supply_raw, elec_raw):
-        meta = source.pop(-1, {})
-        for econ_code, meta_entry in meta.items():
-            names.setdefault(econ_code, meta_entry.get("name", econ_code))
+    # Open the workbook once; both sheets are parsed from the same handle
+    with pd.ExcelFile(workbook, engine=prep.EXCEL_ENGINE) as xls:
+        supply_raw, supply_names = _read_by_fuel_sheet(
+            xls,
+            sheet=supply_sheet,
+            fuel_map=SUPPLY_FUEL_MAP,
+            unit_to_pj=1000.0,  # EJ -> PJ
+            year_suffixes=YEAR_SUFFIXES,
+        )
+        elec_raw, elec_names = _read_by_fuel_sheet(
+            xls,
+            sheet=elec_sheet,
+            fuel_map=ELEC_FUEL_MAP,
+            unit_to_pj=3.6,  # TWh -> PJ
+            year_suffixes=YEAR_SUFFIXES,
+        )
+
+    # Supply sheet names take precedence
+    names: Dict[str, str] = {**elec_names, **supply_names}
 
     sectors_by_year = _merge_sector_data(supply_raw, elec_raw)
     years = sorted(sectors_by_year.keys())
 
-    datasets: Dict[str, Dict] = {}
-    profile_counts: List[int] = []
-    for year in years:
-        profiles: List[Dict] = []
-        for econ_code, sectors in sorted(sectors_by_year[year].items()):
-            profile = {
-                "economy": econ_code,
-                "name": names.get(econ_code, econ_code),
-                "source": "EI",
-                "sectors": sectors,
-            }
-            profile = prep._attach_metrics(profile, exports_negative=False)
-            prep._validate_metrics(profile)
-            profiles.append(profile)
-        datasets[str(year)] = {"year": year, "scenario": scenario, "profiles": profiles}
-        profile_counts.append(len(profiles))
-
-    out_obj = {
-        "years": years,
-        "defaultYear": max(years),
-        "scenario": scenario,
-        "datasets": datasets,
-    }
-    output_json.parent.mkdir(parents=True, exist_ok=True)
-    output_json.write_text(json.dumps(out_obj, indent=2))
-    prep._write_group_shards(out_obj, output_json)
+    def year_datasets() -> Iterator[tuple[str, Dict]]:
+        for year in years:
+            profiles: List[Dict] = []
+            for econ_code, sectors in sorted(sectors_by_year[year].items()):
+                profile = {
+                    "economy": econ_code,
+                    "name": names.get(econ_code, econ_code),
+                    "source": "EI",
+                    "sectors": sectors,
+                }
+                profile = prep._finalize_metrics(profile, exports_negative=False)
+                profiles.append(profile)
+            yield str(year), {"year": year, "scenario": scenario, "profiles": profiles}
+
+    # Each year is written (full JSON + shards) as soon as it is built
+    counts = prep._write_datasets_streaming(
+        output_json, years, max(years), scenario, year_datasets(), ndjson=ndjson_shards
+    )
     print(f"[INFO] Wrote EI profiles for years {years} to {output_json}")
-    return sum(profile_counts)
+    return sum(counts.values())
 
 
 def main() -> None:
@@ -236,9 +228,14 @@ def main() -> None:
         default="public/data/energy-profiles-ei.json",
         help="Where to write the EI JSON dataset.",
     )
+    parser.add_argument(
+        "--ndjson-shards",
+        action="store_true",
+        help="Also write each shard as NDJSON (one profile per line) for streaming readers.",
+    )
     args = parser.parse_args()
 
-    generate_ei_assets(Path(args.input), Path(args.output_json))
+    generate_ei_assets(Path(args.input), Path(args.output_json), ndjson_shards=args.ndjson_shards)
 
 
 if __name__ == "__main__":
@@ -17,18 +17,52 @@ Required columns in the Excel sheet:
 - fuels (e.g. coal)
 - a numeric column with the selected year (e.g. 2020)
 
-Dependencies: pandas, matplotlib, openpyxl.
+Dependencies: pandas, matplotlib, openpyxl (optional: orjson for faster JSON writes,
+python-calamine for faster Excel parsing, pyarrow for faster CSV parsing).
 """
 from __future__ import annotations
 
 import argparse
+import csv
+import hashlib
 import json
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
 
-import matplotlib.pyplot as plt
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np
 import pandas as pd
 import math
+import multiprocessing
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import python_calamine  # noqa: F401
+
+    EXCEL_ENGINE = "calamine"
+except ImportError:  # pragma: no cover - optional speedup
+    EXCEL_ENGINE = "openpyxl"
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import parquet as pa_parquet
+except ImportError:  # pragma: no cover - optional speedup
+    pa = None
+    pa_csv = None
+    pa_parquet = None
 from mappings import (
     CHART_FUELS,
     ELEC_PRODUCTION_LABELS,
@@ -68,61 +102,95 @@ APEC_NAME_MAP = {
 }
 
 
+_APEC_FUEL_PREFIX: Dict[str, str] = {
+    **dict.fromkeys(("01_", "02_", "03_", "04_"), "coal"),
+    **dict.fromkeys(("05_", "06_", "07_"), "oil"),
+    "08_": "gas",
+    "17_": "electricity",
+    **dict.fromkeys(
+        ("09_", "10_", "11_", "12_", "13_", "14_", "15_", "16_", "18_"),
+        "renewables_and_others",
+    ),
+}
+
+_APEC_ELEC_FUEL_PREFIX: Dict[str, str] = {
+    # Coal family
+    **dict.fromkeys(("01_", "02_", "03_", "04_"), "coal"),
+    # Oil family
+    **dict.fromkeys(("05_", "06_", "07_"), "oil"),
+    "08_": "gas",
+    "09_": "nuclear",
+    # Hydro / geothermal
+    "10_": "hydro",
+    "11_": "geothermal",
+    # Variable renewables
+    **dict.fromkeys(("12_", "13_", "14_"), "wind_solar"),
+    # Biomass / other renewables
+    **dict.fromkeys(("15_", "16_"), "renewables_and_others"),
+}
+
+
+@lru_cache(maxsize=4096)
 def _map_apec_fuel(fuel: str) -> Optional[str]:
     """
     Collapse APEC fuel codes to chart fuels.
     """
-    f = fuel.lower().strip()
-    if f.startswith("01_") or f.startswith("02_") or f.startswith("03_") or f.startswith("04_"):
-        return "coal"
-    if f.startswith("05_") or f.startswith("06_") or f.startswith("07_"):
-        return "oil"
-    if f.startswith("08_"):
-        return "gas"
-    if f.startswith("17_"):
-        return "electricity"
-    if f.startswith("09_") or f.startswith("10_") or f.startswith("11_") or f.startswith("12_") or f.startswith("13_") or f.startswith("14_") or f.startswith("15_") or f.startswith("16_") or f.startswith("18_"):
-        return "renewables_and_others"
-    return None
+    return _APEC_FUEL_PREFIX.get(fuel.strip()[:3])
 
 
+@lru_cache(maxsize=4096)
 def _map_apec_elec_fuel(fuel: str) -> Optional[str]:
     """
     Detailed mapping for APEC electricity generation fuels.
+    Aggregates and non-generation fuel rows map to None.
     """
-    f = fuel.lower().strip()
-    # Coal family
-    if f.startswith("01_") or f.startswith("02_") or f.startswith("03_") or f.startswith("04_"):
-        return "coal"
-    # Oil family
-    if f.startswith("05_") or f.startswith("06_") or f.startswith("07_"):
-        return "oil"
-    # Gas
-    if f.startswith("08_"):
-        return "gas"
-    # Nuclear
-    if f.startswith("09_"):
-        return "nuclear"
-    # Hydro / geothermal
-    if f.startswith("10_"):
-        return "hydro"
-    if f.startswith("11_"):
-        return "geothermal"
-    # Variable renewables
-    if f.startswith("12_") or f.startswith("13_") or f.startswith("14_"):
-        return "wind_solar"
-    # Biomass / other renewables
-    if f.startswith("15_") or f.startswith("16_"):
-        return "renewables_and_others"
-    # Ignore aggregates and non-generation fuel rows for elec output
-    return None
+    return _APEC_ELEC_FUEL_PREFIX.get(fuel.strip()[:3])
+
+
+def _fuel_list(
+    fuel_map: Dict[str, float], fuel_order: Optional[List[str]] = None
+) -> List[Dict[str, float]]:
+    """
+    Fuel -> value mapping as the [{fuel, value}] list used in profiles, sorted by fuel.
+    Pass a pre-sorted fuel_order (a superset of the keys) to skip the per-call sort.
+    """
+    if fuel_order is None:
+        return [{"fuel": fuel, "value": float(val)} for fuel, val in sorted(fuel_map.items())]
+    return [{"fuel": fuel, "value": float(fuel_map[fuel])} for fuel in fuel_order if fuel in fuel_map]
+
+
+def _add_net_imports(sectors: Dict[str, List[Dict[str, float]]]) -> None:
+    """
+    Add a net_imports sector (imports + exports by fuel) when either is present.
+    """
+    imports = sectors.get("02_imports", [])
+    exports = sectors.get("03_exports", [])
+    if imports or exports:
+        net_map: Counter = Counter()
+        for item in imports + exports:
+            net_map[item["fuel"]] += item["value"]
+        sectors["net_imports"] = _fuel_list(net_map)
+
+
+def _sector_sums(sectors: Dict[str, List[Dict[str, float]]]) -> Dict[str, float]:
+    """
+    Total value per sector, computed once and shared by metrics and validation.
+    """
+    return {
+        key: sum(float(f.get("value", 0) or 0) for f in fuels)
+        for key, fuels in sectors.items()
+    }
 
 
 def _sector_totals(
-    sectors: Dict[str, List[Dict[str, float]]], exports_negative: bool
+    sectors: Dict[str, List[Dict[str, float]]],
+    exports_negative: bool,
+    sums: Optional[Dict[str, float]] = None,
 ) -> Dict[str, float]:
+    sums = _sector_sums(sectors) if sums is None else sums
+
     def sum_sector(key: str) -> float:
-        return sum(float(f.get("value", 0) or 0) for f in sectors.get(key, []))
+        return sums.get(key, 0)
 
     imports = sum_sector("02_imports")
     exports = sum_sector("03_exports")
@@ -149,7 +217,7 @@ def _sector_totals(
 def _net_imports_by_fuel(
     sectors: Dict[str, List[Dict[str, float]]], exports_negative: bool
 ) -> List[Dict[str, float]]:
-    fuel_map: Dict[str, float] = {}
+    fuel_map: Counter = Counter()
     imports = sectors.get("02_imports", [])
     exports = sectors.get("03_exports", [])
 
@@ -157,29 +225,44 @@ def _net_imports_by_fuel(
         for item in imports:
             fuel = item.get("fuel")
             if fuel:
-                fuel_map[fuel] = fuel_map.get(fuel, 0.0) + float(item.get("value", 0) or 0)
+                fuel_map[fuel] += float(item.get("value", 0) or 0)
+        sign = 1.0 if exports_negative else -1.0
         for item in exports:
             fuel = item.get("fuel")
             if fuel:
-                adj = float(item.get("value", 0) or 0)
-                fuel_map[fuel] = fuel_map.get(fuel, 0.0) + (adj if exports_negative else -adj)
+                fuel_map[fuel] += sign * float(item.get("value", 0) or 0)
     elif "net_imports" in sectors:
         for item in sectors.get("net_imports", []):
             fuel = item.get("fuel")
             if fuel:
-                fuel_map[fuel] = fuel_map.get(fuel, 0.0) + float(item.get("value", 0) or 0)
+                fuel_map[fuel] += float(item.get("value", 0) or 0)
 
-    return [{"fuel": k, "value": v} for k, v in sorted(fuel_map.items())]
+    return _fuel_list(fuel_map)
 
 
-def _sector_stats(sectors: Dict[str, List[Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
-    stats: Dict[str, Dict[str, float]] = {}
+def _profile_sums(
+    sectors: Dict[str, List[Dict[str, float]]], exports_negative: bool
+) -> tuple[Dict[str, float], List[Dict[str, float]]]:
+    """
+    One pass over every sector: per-sector totals (as _sector_sums) plus
+    net imports by fuel (as _net_imports_by_fuel).
+    """
+    sums: Dict[str, float] = {}
+    trade: Counter = Counter()
+    net: Counter = Counter()
+    export_sign = 1.0 if exports_negative else -1.0
     for key, fuels in sectors.items():
-        if not fuels:
-            continue
         vals = [float(f.get("value", 0) or 0) for f in fuels]
-        stats[key] = {"max": max(vals), "min": min(vals)}
-    return stats
+        sums[key] = sum(vals)
+        if key == "02_imports" or key == "03_exports" or key == "net_imports":
+            target = net if key == "net_imports" else trade
+            sign = export_sign if key == "03_exports" else 1.0
+            for f, val in zip(fuels, vals):
+                fuel = f.get("fuel")
+                if fuel:
+                    target[fuel] += sign * val
+    fuel_map = trade if sectors.get("02_imports") or sectors.get("03_exports") else net
+    return sums, _fuel_list(fuel_map)
 
 
 def _aggregate_fuels(
@@ -187,14 +270,12 @@ def _aggregate_fuels(
     keep: set[str] = CHART_FUELS,
     mapper: Optional[callable] = None,
 ) -> List[Dict[str, float]]:
-    agg: Dict[str, float] = {}
+    agg: Counter = Counter()
     for f in fuels:
-        fuel_raw = f.get("fuel")
-        fuel = mapper(fuel_raw) if mapper else fuel_raw
-        if fuel not in keep:
-            continue
-        agg[fuel] = agg.get(fuel, 0.0) + float(f.get("value", 0) or 0)
-    return [{"fuel": k, "value": v} for k, v in sorted(agg.items())]
+        fuel = mapper(f.get("fuel")) if mapper else f.get("fuel")
+        if fuel in keep:
+            agg[fuel] += float(f.get("value", 0) or 0)
+    return _fuel_list(agg)
 
 
 def _drop_tiny_contributors(
@@ -206,65 +287,226 @@ def _drop_tiny_contributors(
     """
     if not fuels:
         return fuels
-    max_abs = max(abs(float(f.get("value", 0) or 0)) for f in fuels)
+    # Coerce each value once and reuse it for both the max and the filter
+    magnitudes = [abs(float(f.get("value", 0) or 0)) for f in fuels]
+    max_abs = max(magnitudes)
     if max_abs <= 0:
         return fuels
     cutoff = max_abs * threshold
-    filtered = [f for f in fuels if abs(float(f.get("value", 0) or 0)) >= cutoff]
-    return filtered
+    return [f for f, mag in zip(fuels, magnitudes) if mag >= cutoff]
 
 
-def _write_group_shards(out_obj: Dict, output_json: Path, group_size: int = 50) -> None:
+def _json_bytes(obj: object) -> bytes:
     """
-    Split datasets into year-first, economy-group shards and write an index:
-    - index: { years, defaultYear, scenario, year_groups: {year: [{id,file,economies}]} }
-    - shards: <stem>-<year>-gN.json containing only that year's subset of economies.
+    Serialize obj as indented JSON bytes; uses orjson when installed, stdlib json otherwise.
     """
-    datasets = out_obj.get("datasets", {})
-    years = out_obj.get("years", [])
-    default_year = out_obj.get("defaultYear")
-    scenario = out_obj.get("scenario")
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(obj, indent=2).encode("utf-8")
 
-    index_path = output_json.with_name(f"{output_json.stem}.index.json")
-    year_groups: Dict[str, List[Dict[str, object]]] = {}
 
-    # Clean up any old shard files for this stem to avoid stale data
-    shard_glob = f"{output_json.stem}-*-g*.json"
-    for old in output_json.parent.glob(shard_glob):
-        try:
-            old.unlink()
-        except OSError:
-            pass
-
-    for year_str, data in datasets.items():
-        profiles = data.get("profiles", [])
-        economies = sorted({p.get("economy", "") for p in profiles})
-        groups: List[Dict[str, object]] = []
-        for idx in range(0, len(economies), group_size):
-            econ_slice = economies[idx : idx + group_size]
-            group_id = f"g{idx // group_size}"
-            filtered = [p for p in profiles if p.get("economy") in econ_slice]
-            shard = {
-                "year": data.get("year"),
-                "scenario": data.get("scenario", scenario),
-                "profiles": filtered,
-            }
-            shard_path = output_json.with_name(
-                f"{output_json.stem}-{year_str}-{group_id}{output_json.suffix}"
-            )
-            shard_path.write_text(json.dumps(shard, indent=2))
-            groups.append(
-                {"id": group_id, "file": shard_path.name, "economies": econ_slice}
-            )
-        year_groups[year_str] = groups
+def _dump_json(obj: object, path: Path) -> None:
+    path.write_bytes(_json_bytes(obj))
+
+
+def _json_line(obj: object) -> bytes:
+    """
+    Serialize obj as compact single-line JSON (for shards and NDJSON output).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _clear_group_shards(output_json: Path, keep: frozenset = frozenset()) -> None:
+    """
+    Remove old shard files for this stem to avoid stale data.
+    Matches <stem>-*-g*.json / .ndjson in a single directory scan; names in keep survive.
+    """
+    prefix = f"{output_json.stem}-"
+    try:
+        entries = os.scandir(output_json.parent)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            name = entry.name
+            if not name.startswith(prefix) or name in keep:
+                continue
+            for suffix in (".json", ".ndjson"):
+                if name.endswith(suffix) and "-g" in name[len(prefix) : -len(suffix)]:
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+                    break
+
+
+def _write_files(files: List[tuple[Path, bytes]], max_workers: int = 8) -> None:
+    """
+    Write already-serialized payloads, overlapping the file I/O on a small thread pool.
+    """
+    if len(files) <= 1:
+        for path, payload in files:
+            path.write_bytes(payload)
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        list(pool.map(lambda job: job[0].write_bytes(job[1]), files))
+
 
+def _write_year_shards(
+    output_json: Path,
+    year_str: str,
+    data: Dict,
+    scenario: Optional[str],
+    group_size: int = 50,
+    ndjson: bool = False,
+    staging_suffix: str = "",
+) -> List[Dict[str, object]]:
+    """
+    Write one year's economy-group shards (compact JSON) and return their index entries.
+    With ndjson=True, also write <shard>.ndjson holding one profile per line.
+    A staging_suffix writes each file to <name><suffix>; the index entries keep the final names.
+    """
+    profiles = data.get("profiles", [])
+    economies = sorted({p.get("economy", "") for p in profiles})
+    groups: List[Dict[str, object]] = []
+    files: List[tuple[Path, bytes]] = []
+    for idx in range(0, len(economies), group_size):
+        econ_slice = economies[idx : idx + group_size]
+        group_id = f"g{idx // group_size}"
+        filtered = [p for p in profiles if p.get("economy") in econ_slice]
+        shard = {
+            "year": data.get("year"),
+            "scenario": data.get("scenario", scenario),
+            "profiles": filtered,
+        }
+        shard_path = output_json.with_name(
+            f"{output_json.stem}-{year_str}-{group_id}{output_json.suffix}"
+        )
+        # Shards are fetched by the app, not read by people: skip the indentation
+        files.append((shard_path, _json_line(shard)))
+        group: Dict[str, object] = {"id": group_id, "file": shard_path.name, "economies": econ_slice}
+        if ndjson:
+            ndjson_path = shard_path.with_suffix(".ndjson")
+            files.append((ndjson_path, b"".join(_json_line(p) + b"\n" for p in filtered)))
+            group["ndjson"] = ndjson_path.name
+        groups.append(group)
+    if staging_suffix:
+        files = [(path.with_name(path.name + staging_suffix), payload) for path, payload in files]
+    _write_files(files)
+    return groups
+
+
+def _write_shard_index(
+    output_json: Path,
+    years: List[int],
+    default_year: Optional[int],
+    scenario: Optional[str],
+    year_groups: Dict[str, List[Dict[str, object]]],
+) -> None:
     index_payload = {
         "years": years,
         "defaultYear": default_year,
         "scenario": scenario,
         "year_groups": year_groups,
     }
-    index_path.write_text(json.dumps(index_payload, indent=2))
+    _dump_json(index_payload, output_json.with_name(f"{output_json.stem}.index.json"))
+
+
+def _write_group_shards(
+    out_obj: Dict, output_json: Path, group_size: int = 50, ndjson: bool = False
+) -> None:
+    """
+    Split datasets into year-first, economy-group shards and write an index:
+    - index: { years, defaultYear, scenario, year_groups: {year: [{id,file,economies}]} }
+    - shards: <stem>-<year>-gN.json containing only that year's subset of economies.
+    """
+    scenario = out_obj.get("scenario")
+    _clear_group_shards(output_json)
+    year_groups = {
+        year_str: _write_year_shards(output_json, year_str, data, scenario, group_size, ndjson)
+        for year_str, data in out_obj.get("datasets", {}).items()
+    }
+    _write_shard_index(
+        output_json, out_obj.get("years", []), out_obj.get("defaultYear"), scenario, year_groups
+    )
+
+
+def _write_datasets_streaming(
+    output_json: Path,
+    years: List[int],
+    default_year: int,
+    scenario: str,
+    year_datasets: Iterable[tuple[str, Dict]],
+    group_size: int = 50,
+    ndjson: bool = False,
+) -> Dict[str, int]:
+    """
+    Write a multi-year JSON one year at a time, plus its shards and index.
+    year_datasets may be a generator so only one year's profiles are held in memory.
+    The JSON and shards are staged as *.tmp files and only replace the previous
+    output (and stale shards are cleared) once every year has been written.
+    Returns the profile count per year.
+    """
+    output_json.parent.mkdir(parents=True, exist_ok=True)
+    tmp_json = output_json.with_suffix(".tmp")
+
+    def nested(obj: object) -> bytes:
+        return _json_bytes(obj).replace(b"\n", b"\n    ")
+
+    counts: Dict[str, int] = {}
+    year_groups: Dict[str, List[Dict[str, object]]] = {}
+    staged: List[str] = []
+    try:
+        with tmp_json.open("wb") as fh:
+            fh.write(b'{\n  "years": ' + _json_bytes(years).replace(b"\n", b"\n  "))
+            fh.write(b',\n  "defaultYear": ' + _json_bytes(default_year))
+            fh.write(b',\n  "scenario": ' + _json_bytes(scenario))
+            fh.write(b',\n  "datasets": {')
+            for year_str, data in year_datasets:
+                fh.write(b"," if counts else b"")
+                fh.write(b"\n    " + _json_bytes(year_str) + b": " + nested(data))
+                counts[year_str] = len(data.get("profiles", []))
+                groups = _write_year_shards(
+                    output_json, year_str, data, scenario, group_size, ndjson, staging_suffix=".tmp"
+                )
+                year_groups[year_str] = groups
+                staged.extend(g[key] for g in groups for key in ("file", "ndjson") if key in g)
+            fh.write(b"\n  }\n}")
+    except BaseException:
+        for name in staged:
+            output_json.with_name(name + ".tmp").unlink(missing_ok=True)
+        tmp_json.unlink(missing_ok=True)
+        raise
+
+    for name in staged:
+        os.replace(output_json.with_name(name + ".tmp"), output_json.with_name(name))
+    os.replace(tmp_json, output_json)
+    _clear_group_shards(output_json, keep=frozenset(staged))
+    _write_shard_index(output_json, years, default_year, scenario, year_groups)
+    return counts
+
+
+# End-use sectors that make up total final consumption
+END_USE_SECTORS = (
+    "14_industry_sector",
+    "15_transport_sector",
+    "16_buildings_sector",
+    "16_other_sector",
+    "17_nonenergy_use",
+)
+# Label of each end-use sector's entry in the derived TFC breakdown
+TFC_SECTOR_LABELS = {
+    "14_industry_sector": "industry",
+    "15_transport_sector": "transport",
+    "16_buildings_sector": "buildings",
+    "16_other_sector": "others",
+    "17_nonenergy_use": "non_energy_use",
+}
 
 
 def _prune_sectors(
@@ -292,13 +534,7 @@ def _prune_sectors(
         )
 
     # Keep end-use sectors if present
-    for key in [
-        "14_industry_sector",
-        "15_transport_sector",
-        "16_buildings_sector",
-        "16_other_sector",
-        "17_nonenergy_use",
-    ]:
+    for key in END_USE_SECTORS:
         if key in sectors:
             pruned[key] = _drop_tiny_contributors(
                 _aggregate_fuels(sectors[key], mapper=fuel_mapper)
@@ -306,15 +542,8 @@ def _prune_sectors(
 
     # Derive TFC by sector (not by fuel) from end-use sectors
     if aggregate_tfc:
-        sector_map = {
-            "14_industry_sector": "industry",
-            "15_transport_sector": "transport",
-            "16_buildings_sector": "buildings",
-            "16_other_sector": "others",
-            "17_nonenergy_use": "non_energy_use",
-        }
         tfc_entries: List[Dict[str, float]] = []
-        for key, label in sector_map.items():
+        for key, label in TFC_SECTOR_LABELS.items():
             if key in pruned:
                 total_val = sum(float(f.get("value", 0) or 0) for f in pruned[key])
                 tfc_entries.append({"fuel": label, "value": total_val})
@@ -337,6 +566,7 @@ def _prune_sectors(
     return pruned
 
 
+@lru_cache(maxsize=4096)
 def _map_apec_sector(sector: str, sub2sector: Optional[str]) -> str:
     if sector == "16_other_sector" and sub2sector:
         lbl = sub2sector.lower()
@@ -347,25 +577,34 @@ def _map_apec_sector(sector: str, sub2sector: Optional[str]) -> str:
     return sector
 
 
-def _attach_metrics(profile: Dict, exports_negative: bool) -> Dict:
+def _attach_metrics(
+    profile: Dict,
+    exports_negative: bool,
+    sums: Optional[Dict[str, float]] = None,
+    net_by_fuel: Optional[List[Dict[str, float]]] = None,
+) -> Dict:
     sectors = profile.get("sectors", {})
+    if net_by_fuel is None:
+        net_by_fuel = _net_imports_by_fuel(sectors, exports_negative)
     profile["metrics"] = {
-        **_sector_totals(sectors, exports_negative),
-        "net_imports_by_fuel": _net_imports_by_fuel(sectors, exports_negative),
+        **_sector_totals(sectors, exports_negative, sums),
+        "net_imports_by_fuel": net_by_fuel,
     }
     return profile
 
 
-def _validate_metrics(profile: Dict) -> None:
+def _validate_metrics(profile: Dict, sums: Optional[Dict[str, float]] = None) -> None:
     """
     Sanity check that metrics match sector sums; logs warnings if mismatched.
+    Pass the sums used for _attach_metrics to avoid re-summing every sector.
     """
     name = profile.get("economy", "unknown")
     sectors = profile.get("sectors", {})
     metrics = profile.get("metrics", {})
+    sums = _sector_sums(sectors) if sums is None else sums
 
     def sum_sector(key: str) -> float:
-        return sum(float(f.get("value", 0) or 0) for f in sectors.get(key, []))
+        return sums.get(key, 0)
 
     checks = {
         "tpes": (
@@ -386,6 +625,16 @@ def _validate_metrics(profile: Dict) -> None:
             print(f"[WARN] Metrics mismatch {name} {label}: metric={metric_val} sector_sum={sector_sum}")
 
 
+def _finalize_metrics(profile: Dict, exports_negative: bool) -> Dict:
+    """
+    Attach and validate metrics from a single traversal of the profile's sectors.
+    """
+    sums, net_by_fuel = _profile_sums(profile.get("sectors", {}), exports_negative)
+    _attach_metrics(profile, exports_negative, sums=sums, net_by_fuel=net_by_fuel)
+    _validate_metrics(profile, sums)
+    return profile
+
+
 DEFAULT_SECTORS = [
     "01_production",
     "07_total_primary_energy_supply",
@@ -418,15 +667,10 @@ UN_SECTORS = [
 DEFAULT_SOURCE = "APEC"
 
 
-def build_profile(
-    df: pd.DataFrame,
-    economy: str,
-    sectors: Iterable[str],
-    year: int,
-    label_column: str,
-    source: str = DEFAULT_SOURCE,
-) -> Dict:
-    # Choose best available label
+def _profile_names(df: pd.DataFrame, label_column: str) -> Dict[str, str]:
+    """
+    Map economy code -> display name using the best available label column.
+    """
     label_col = (
         label_column
         if label_column in df.columns and label_column != "economy"
@@ -434,61 +678,267 @@ def build_profile(
     )
     if not label_col and "economy_name" in df.columns:
         label_col = "economy_name"
-    name_val = (
-        str(df[df["economy"] == economy][label_col].iloc[0])
-        if label_col
-        else APEC_NAME_MAP.get(economy, economy)
-    )
+    if not label_col:
+        return {econ: APEC_NAME_MAP.get(econ, econ) for econ in df["economy"].unique()}
+    first_labels = df.drop_duplicates("economy").set_index("economy")[label_col]
+    return {econ: str(label) for econ, label in first_labels.items()}
+
+
+def build_profile(
+    fuel_rows: Dict[tuple, List[tuple]],
+    economy: str,
+    sectors: Iterable[str],
+    name: str,
+    source: str = DEFAULT_SOURCE,
+) -> Dict:
+    """
+    Build one profile from (fuel, value) rows pre-split by (economy, sector).
+    """
     profile: Dict = {
         "economy": economy,
-        "name": name_val,
+        "name": name,
         "source": source,
         "sectors": {},
     }
 
     for sector in sectors:
-        filtered = df[
-            (df["economy"] == economy)
-            & (df["sectors"] == sector)
-            & (~df[year].isna())
-        ]
-        by_fuel = filtered.groupby("fuels")[year].sum().reset_index()
+        scale = 0.0036 if sector == "18_electricity_output_in_gwh" else 1.0
         profile["sectors"][sector] = [
-            {
-                "fuel": row["fuels"],
-                "value": float(row[year])
-                * (0.0036 if sector == "18_electricity_output_in_gwh" else 1.0),
-            }
-            for _, row in by_fuel.iterrows()
+            {"fuel": fuel, "value": val * scale}
+            for fuel, val in fuel_rows.get((economy, sector), [])
         ]
 
     return profile
 
 
-def render_charts(
-    profile: Dict, sectors: List[str], year: int, charts_dir: Path
-) -> str:
-    charts_dir.mkdir(parents=True, exist_ok=True)
-    fig, axes = plt.subplots(1, len(sectors), figsize=(5 * len(sectors), 4))
-    if len(sectors) == 1:
-        axes = [axes]
+# Bump when the chart drawing code changes so cached charts are re-rendered
+CHART_STYLE_VERSION = 1
+
+
+def _chart_digest(profile: Dict, sectors: List[str], year: int) -> str:
+    """
+    Short hash of everything that ends up in an economy's chart (data, year, style version).
+    """
+    chart_input = {
+        "style": CHART_STYLE_VERSION,
+        "year": year,
+        "sectors": [[s, profile["sectors"].get(s, [])] for s in sectors],
+    }
+    return hashlib.blake2b(_json_line(chart_input), digest_size=8).hexdigest()
+
+
+def _load_chart_hashes(cache_file: Path, charts_dir: Path) -> Dict[str, str]:
+    """
+    economy -> chart digest from the chart cache; empty if missing, unreadable or
+    written for another charts directory.
+    """
+    try:
+        cached = json.loads(cache_file.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cached, dict) or cached.get("charts_dir") != str(charts_dir.resolve()):
+        return {}
+    return cached.get("hashes") or {}
+
+
+def _save_chart_hashes(cache_file: Path, charts_dir: Path, hashes: Dict[str, str]) -> None:
+    tmp = cache_file.with_name(cache_file.name + ".tmp")
+    try:
+        _dump_json({"charts_dir": str(charts_dir.resolve()), "hashes": hashes}, tmp)
+        os.replace(tmp, cache_file)
+    except OSError as e:
+        print(f"[WARN] Could not write chart cache {cache_file}: {e}")
+
+
+class ChartRenderer:
+    """
+    Render per-economy bar charts onto one reused figure.
+    Axes are cleared between economies instead of building a new figure each time.
+    """
+
+    def __init__(self, sectors: List[str], year: int, charts_dir: Path) -> None:
+        self.sectors = sectors
+        self.year = year
+        self.charts_dir = charts_dir
+        charts_dir.mkdir(parents=True, exist_ok=True)
+        self.fig, axes = plt.subplots(1, len(sectors), figsize=(5 * len(sectors), 4))
+        self.axes = [axes] if len(sectors) == 1 else list(axes)
+
+    def render(self, profile: Dict) -> str:
+        """
+        Save the economy's chart and return its file name.
+        """
+        filename = f"{profile['economy']}.png"
+
+        for ax, sector in zip(self.axes, self.sectors):
+            sector_data = profile["sectors"].get(sector, [])
+            fuels = [item["fuel"] for item in sector_data]
+            values = [item["value"] for item in sector_data]
+            positions = range(len(fuels))
 
-    for ax, sector in zip(axes, sectors):
-        sector_data = profile["sectors"].get(sector, [])
-        fuels = [item["fuel"] for item in sector_data]
-        values = [item["value"] for item in sector_data]
+            ax.cla()
+            ax.bar(positions, values)
+            ax.set_title(sector)
+            ax.set_xticks(positions)
+            ax.set_xticklabels(fuels, rotation=90)
+            ax.set_ylabel("PJ")
+            ax.set_xlabel(f"Values for {self.year}")
 
-        ax.bar(fuels, values)
-        ax.set_title(sector)
-        ax.set_xticklabels(fuels, rotation=90)
-        ax.set_ylabel("PJ")
-        ax.set_xlabel(f"Values for {year}")
+        self.fig.tight_layout()
+        self.fig.savefig(self.charts_dir / filename, bbox_inches="tight")
+        return filename
 
-    plt.tight_layout()
-    filename = f"{profile['economy']}.png"
-    fig.savefig(charts_dir / filename, bbox_inches="tight")
-    plt.close(fig)
-    return filename
+
+_chart_renderer: Optional[ChartRenderer] = None
+
+
+def _init_chart_worker(sectors: List[str], year: int, charts_dir: Path) -> None:
+    """
+    Process-pool initializer: build one reusable renderer per worker.
+    """
+    global _chart_renderer
+    _chart_renderer = ChartRenderer(sectors, year, charts_dir)
+
+
+def _render_chart_worker(profile: Dict) -> str:
+    return _chart_renderer.render(profile)
+
+
+def _nested_totals() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    economy -> sector -> fuel -> running total, with levels created on first access.
+    """
+    return defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+
+
+# Block size for pyarrow's streaming CSV reader; bounds memory per batch
+CSV_BLOCK_SIZE = 64 << 20
+
+
+def _infer_csv_types(
+    input_path: Path, columns: Optional[List[str]], known: Dict[str, object]
+) -> Dict[str, object]:
+    """
+    Whole-file type inference for the streaming CSV reader, which otherwise fixes
+    each column's type from the first block (a column empty there fails on its first
+    value further down). One bounded pass reads the columns as text; each gets the
+    narrowest of int64 / float64 / string that fits every value (null if it has none).
+    """
+    ranks = (pa.null(), pa.int64(), pa.float64(), pa.string())
+    if columns is None:
+        with open(input_path, newline="", encoding="utf-8-sig") as fh:
+            columns = next(csv.reader(fh), [])
+    todo = {col: 0 for col in columns if col not in known}
+    if not todo:
+        return dict(known)
+    reader = pa_csv.open_csv(
+        input_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(todo),
+            strings_can_be_null=True,
+            column_types={col: pa.string() for col in todo},
+        ),
+    )
+    for batch in reader:
+        for col, rank in todo.items():
+            values = batch.column(col).drop_null()
+            if len(values) and rank == 0:
+                rank = 1
+            while 0 < rank < 3:
+                try:
+                    values.cast(ranks[rank])
+                    break
+                except pa.ArrowInvalid:
+                    rank += 1
+            todo[col] = rank
+    return {**known, **{col: ranks[rank] for col, rank in todo.items()}}
+
+
+def _iter_csv_chunks(
+    input_path: Path,
+    chunksize: int,
+    usecols: Optional[Union[List[str], Callable[[str], bool]]] = None,
+    use_cache: bool = False,
+    column_types: Optional[Dict[str, object]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrame chunks of a CSV file, streaming so memory is bounded by the block
+    and chunk size. Parses with pyarrow's multi-threaded reader when available,
+    otherwise falls back to pandas' chunked reader.
+    usecols may be a list of names or a predicate on the header names.
+    column_types pins pyarrow types for known columns so they skip type inference.
+    With use_cache (pyarrow only), the parsed file is kept as <name>.csv.parquet
+    and reused while its .key file matches the CSV's mtime, size and column_types;
+    an unreadable cache is treated as a miss.
+    """
+    if pa_csv is None:
+        yield from pd.read_csv(input_path, usecols=usecols, chunksize=chunksize)
+        return
+    if callable(usecols):
+        with open(input_path, newline="", encoding="utf-8-sig") as fh:
+            usecols = [col for col in next(csv.reader(fh), []) if usecols(col)]
+
+    cache = input_path.with_name(f"{input_path.name}.parquet")
+    key_file = cache.with_name(cache.name + ".key")
+    if use_cache:
+        st = input_path.stat()
+        pinned = sorted((col, str(typ)) for col, typ in (column_types or {}).items())
+        key = f"{st.st_mtime_ns}-{st.st_size}-{pinned!r}"
+        cached = None
+        if cache.exists() and key_file.exists() and key_file.read_text(encoding="utf-8") == key:
+            try:
+                cached = pa_parquet.ParquetFile(cache)
+            except (pa.ArrowInvalid, OSError) as e:
+                print(f"[WARN] Ignoring unreadable parquet cache {cache}: {e}")
+        if cached is not None:
+            for batch in cached.iter_batches(batch_size=chunksize, columns=usecols):
+                yield batch.to_pandas()
+            return
+
+    # Cache every column so other callers/years can reuse the file
+    include = None if use_cache else usecols
+    reader = pa_csv.open_csv(
+        input_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=include,
+            column_types=_infer_csv_types(input_path, include, column_types or {}),
+            strings_can_be_null=True,
+        ),
+    )
+    writer = None
+    tmp = cache.with_name(cache.name + ".tmp")
+    if use_cache:
+        # Written alongside the stream and renamed into place only once it is complete
+        try:
+            writer = pa_parquet.ParquetWriter(tmp, reader.schema)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Could not write parquet cache {cache}: {e}")
+    complete = False
+    try:
+        for batch in reader:
+            if writer is not None:
+                try:
+                    writer.write_batch(batch)
+                except (OSError, ValueError) as e:
+                    print(f"[WARN] Could not write parquet cache {cache}: {e}")
+                    writer.close()
+                    writer = None
+                    tmp.unlink(missing_ok=True)
+            if include is None and usecols is not None:
+                batch = batch.select(usecols)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+        complete = True
+    finally:
+        if writer is not None:
+            writer.close()
+            if complete:
+                os.replace(tmp, cache)
+                key_file.write_text(key, encoding="utf-8")
+            else:
+                tmp.unlink(missing_ok=True)
 
 
 def generate_apec_assets_csv_multi(
@@ -499,6 +949,7 @@ def generate_apec_assets_csv_multi(
     scenario: str,
     label_column: str = "economy",
     chunksize: int = 50000,
+    use_cache: bool = True,
 ) -> int:
     """
     Chunked CSV -> multi-year JSON generation for APEC data.
@@ -510,12 +961,17 @@ def generate_apec_assets_csv_multi(
         needed_columns.add(label_column)
 
     totals: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {
-        str(y): {} for y in years
+        str(y): _nested_totals() for y in years
     }
+    chunk_sums: List[pd.DataFrame] = []
     names: Dict[str, str] = {}
     norm_scenario = scenario.strip().lower()
 
-    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+    # Parse only the columns used below; the year columns not requested are skipped
+    wanted_columns = needed_columns | {"sub2sectors", "economy_name"}
+    for chunk in _iter_csv_chunks(
+        input_path, chunksize, usecols=lambda col: col in wanted_columns, use_cache=use_cache
+    ):
         # detect sub2sectors column
         if "sub2sectors" in chunk.columns:
             sub2_present = True
@@ -526,23 +982,20 @@ def generate_apec_assets_csv_multi(
         if missing:
             continue
         chunk = chunk[list(needed)]
-        chunk["economy"] = chunk["economy"].astype(str).str.strip()
-        chunk["sectors"] = chunk["sectors"].astype(str).str.strip()
-        chunk["scenarios"] = chunk["scenarios"].astype(str).str.strip().str.lower()
-        chunk["fuels"] = chunk["fuels"].astype(str).str.strip()
-        if "sub2sectors" in chunk.columns:
-            chunk["sub2sectors"] = chunk["sub2sectors"].astype(str).str.strip()
+        # Low-cardinality label columns: normalise each distinct value once
+        # and filter on scenario before touching the remaining columns.
+        scenarios = _map_unique(lambda v: str(v).strip().lower(), chunk["scenarios"])
+        chunk = chunk[scenarios == norm_scenario]
+        if chunk.empty:
+            continue
         label_col = None
         if label_column in chunk.columns and label_column != "economy":
             label_col = label_column
         elif "economy_name" in chunk.columns:
             label_col = "economy_name"
-        if label_col:
-            chunk[label_col] = chunk[label_col].astype(str).str.strip()
-
-        chunk = chunk[chunk["scenarios"] == norm_scenario]
-        if chunk.empty:
-            continue
+        for col in ("economy", "sectors", "fuels", "sub2sectors", label_col):
+            if col and col in chunk.columns:
+                chunk[col] = _map_unique(_strip_label, chunk[col])
 
         if label_col:
             names.update(chunk.groupby("economy")[label_col].first().to_dict())
@@ -550,94 +1003,149 @@ def generate_apec_assets_csv_multi(
             # fallback to static map
             names.update({econ: APEC_NAME_MAP.get(econ, econ) for econ in chunk["economy"].unique()})
 
-        for y in years:
-            col = str(y)
-            if col not in chunk.columns:
-                continue
-            sub = chunk.dropna(subset=[col])
-            if sub.empty:
-                continue
-            if "sub2sectors" in sub.columns:
-                sub["sector_mapped"] = sub.apply(
-                    lambda r: _map_apec_sector(r["sectors"], r.get("sub2sectors")),
-                    axis=1,
-                )
-            else:
-                sub["sector_mapped"] = sub["sectors"]
-
-            grouped = (
-                sub.groupby(["economy", "sector_mapped", "fuels"])[col]
-                .sum(min_count=1)
-                .reset_index()
-            )
-            for _, row in grouped.iterrows():
-                econ = row["economy"]
-                sector = row["sector_mapped"]
-                fuel = row["fuels"]
-                val = float(row[col])
-                if sector == "18_electricity_output_in_gwh":
-                    val *= 0.0036  # convert GWh to PJ
-                econ_entry = totals[col].setdefault(econ, {})
-                fuel_map = econ_entry.setdefault(sector, {})
-                fuel_map[fuel] = fuel_map.get(fuel, 0.0) + val
-
-    datasets: Dict[str, Dict] = {}
-    profile_counts: List[int] = []
-    for y in sorted(years):
-        y_str = str(y)
-        econ_totals = totals.get(y_str, {})
-        profiles: List[Dict] = []
-        for econ_code in sorted(econ_totals.keys()):
-            sector_data = {}
-            for sector, fuel_map in econ_totals[econ_code].items():
-                sector_data[sector] = [
-                    {"fuel": fuel, "value": float(val)}
-                    for fuel, val in sorted(fuel_map.items())
-                ]
-            # Compute net imports by fuel if imports/exports present
-            imports = sector_data.get("02_imports", [])
-            exports = sector_data.get("03_exports", [])
-            if imports or exports:
-                net_map: Dict[str, float] = {}
-                for item in imports:
-                    net_map[item["fuel"]] = net_map.get(item["fuel"], 0.0) + item["value"]
-                for item in exports:
-                    net_map[item["fuel"]] = net_map.get(item["fuel"], 0.0) + item["value"]
-                sector_data["net_imports"] = [
-                    {"fuel": f, "value": v} for f, v in sorted(net_map.items())
-                ]
-            sector_data = _prune_sectors(
-                sector_data, aggregate_tfc=True, fuel_mapper=_map_apec_fuel
+        if "sub2sectors" in chunk.columns:
+            chunk["sector_mapped"] = _map_unique(
+                _map_apec_sector, chunk["sectors"], chunk["sub2sectors"]
             )
-            profile = _attach_metrics(
-                {
-                    "economy": econ_code,
-                    "name": names.get(econ_code, econ_code),
-                    "source": "APEC",
-                    "sectors": sector_data,
-                },
-                exports_negative=False,
+        else:
+            chunk["sector_mapped"] = chunk["sectors"]
+
+        # One groupby over all requested year columns; a NaN sum means no data for that year
+        year_cols_present = [col for col in year_cols if col in chunk.columns]
+        if year_cols_present:
+            chunk_sums.append(
+                chunk.groupby(["economy", "sector_mapped", "fuels"])[year_cols_present].sum(
+                    min_count=1
+                )
             )
-            _validate_metrics(profile)
-            profiles.append(profile)
-        datasets[y_str] = {
-            "year": y,
-            "scenario": scenario,
-            "profiles": profiles,
-        }
-        profile_counts.append(len(profiles))
 
-    out_obj = {
-        "years": sorted(years),
-        "defaultYear": default_year if default_year in years else years[0],
-        "scenario": scenario,
-        "datasets": datasets,
-    }
-    output_json.parent.mkdir(parents=True, exist_ok=True)
-    output_json.write_text(json.dumps(out_obj, indent=2))
+    # Combine the per-chunk partial sums once, then split out each year
+    if chunk_sums:
+        combined = pd.concat(chunk_sums).groupby(level=[0, 1, 2], sort=False).sum(min_count=1)
+        is_elec = combined.index.get_level_values("sector_mapped") == "18_electricity_output_in_gwh"
+        for col in combined.columns:
+            year_totals = combined[col].astype("float64")
+            year_totals = year_totals.where(~is_elec, year_totals * 0.0036).dropna()  # GWh -> PJ
+            for (econ, sector, fuel), val in zip(year_totals.index.tolist(), year_totals.tolist()):
+                totals[col][econ][sector][fuel] = val
+
+    def year_datasets() -> Iterator[tuple[str, Dict]]:
+        for y in sorted(years):
+            y_str = str(y)
+            econ_totals = totals.get(y_str, {})
+            profiles: List[Dict] = []
+            for econ_code in sorted(econ_totals.keys()):
+                sector_data = {
+                    sector: _fuel_list(fuel_map)
+                    for sector, fuel_map in econ_totals[econ_code].items()
+                }
+                _add_net_imports(sector_data)
+                sector_data = _prune_sectors(
+                    sector_data, aggregate_tfc=True, fuel_mapper=_map_apec_fuel
+                )
+                profile = _finalize_metrics(
+                    {
+                        "economy": econ_code,
+                        "name": names.get(econ_code, econ_code),
+                        "source": "APEC",
+                        "sectors": sector_data,
+                    },
+                    exports_negative=False,
+                )
+                profiles.append(profile)
+            yield y_str, {
+                "year": y,
+                "scenario": scenario,
+                "profiles": profiles,
+            }
+
+    # Each year is written (full JSON + shards) as soon as it is built
+    counts = _write_datasets_streaming(
+        output_json,
+        sorted(years),
+        default_year if default_year in years else years[0],
+        scenario,
+        year_datasets(),
+    )
     print(f"[INFO] Wrote APEC CSV profiles for years {years} to {output_json}")
-    _write_group_shards(out_obj, output_json)
-    return sum(profile_counts)
+    return sum(counts.values())
+
+
+# Sheet names become part of the parquet sidecar file name
+_SHEET_SLUG_RE = re.compile(r"[^0-9A-Za-z]+")
+
+
+def _read_excel_cached(
+    path: Path, sheet_name: Union[str, int] = 0, use_cache: bool = True, **read_kwargs
+) -> pd.DataFrame:
+    """
+    pd.read_excel with a Parquet sidecar per sheet (<stem>.parquet for the first sheet,
+    <stem>.<sheet>.parquet otherwise). The sidecar is reused while a .key file still
+    matches the workbook's mtime, size and read options.
+    """
+    if not use_cache:
+        df = pd.read_excel(path, sheet_name=sheet_name, engine=EXCEL_ENGINE, **read_kwargs)
+        df.columns = [str(col) for col in df.columns]
+        return df
+
+    suffix = (
+        ".parquet" if sheet_name == 0 else f".{_SHEET_SLUG_RE.sub('_', str(sheet_name))}.parquet"
+    )
+    cache = path.with_name(path.stem + suffix)
+    key_file = cache.with_name(cache.name + ".key")
+    st = path.stat()
+    key = f"{st.st_mtime_ns}-{st.st_size}-{sheet_name!r}-{sorted(read_kwargs.items())!r}"
+    if cache.exists() and key_file.exists() and key_file.read_text(encoding="utf-8") == key:
+        return pd.read_parquet(cache)
+
+    df = pd.read_excel(path, sheet_name=sheet_name, engine=EXCEL_ENGINE, **read_kwargs)
+    df.columns = [str(col) for col in df.columns]
+    try:
+        df.to_parquet(cache, index=False, compression="zstd")
+    except (TypeError, ValueError):
+        # Mixed-type object columns (e.g. numbers with "-" markers) are stored as text;
+        # callers coerce these columns with pd.to_numeric anyway
+        # (non-null values only, so missing cells stay null rather than "nan")
+        mixed = {
+            col: df[col].map(lambda v: v if pd.isna(v) else str(v))
+            for col in df.columns
+            if df[col].dtype == object
+        }
+        try:
+            df.assign(**mixed).to_parquet(cache, index=False, compression="zstd")
+        except (ImportError, TypeError, ValueError) as e:
+            print(f"[WARN] Could not write parquet cache {cache}: {e}")
+            return df
+    except ImportError as e:
+        print(f"[WARN] Could not write parquet cache {cache}: {e}")
+        return df
+    key_file.write_text(key, encoding="utf-8")
+    return df
+
+
+def _read_apec_table(
+    input_path: Path, year: int, label_column: str, use_cache: bool = True
+) -> pd.DataFrame:
+    """
+    Read only the columns generate_apec_assets needs, with explicit dtypes.
+    Excel inputs are cached to a sibling .parquet file (see _read_excel_cached).
+    """
+    wanted = {"economy", "sectors", "scenarios", "fuels", "economy_name", label_column, str(year)}
+    key_dtypes = {col: str for col in ("economy", "sectors", "scenarios", "fuels")}
+    dtypes = {**key_dtypes, str(year): "float64"}
+    if input_path.suffix.lower() not in {".xlsx", ".xls"}:
+        return pd.read_csv(input_path, usecols=lambda col: str(col) in wanted, dtype=dtypes)
+    if not use_cache:
+        return pd.read_excel(
+            input_path, usecols=lambda col: str(col) in wanted, dtype=dtypes, engine=EXCEL_ENGINE
+        )
+
+    # Cache the whole sheet so other years/label columns can reuse it
+    df = _read_excel_cached(input_path, dtype=key_dtypes)
+    df = df[[col for col in df.columns if col in wanted]]
+    if str(year) in df.columns:
+        df = df.astype({str(year): "float64"})
+    return df
 
 
 def generate_apec_assets(
@@ -650,48 +1158,65 @@ def generate_apec_assets(
     label_column: str,
     skip_charts: bool,
     source: str = DEFAULT_SOURCE,
+    use_cache: bool = True,
+    force_charts: bool = False,
 ) -> int:
-    if input_path.suffix.lower() in {".xlsx", ".xls"}:
-        df = pd.read_excel(input_path)
-    else:
-        df = pd.read_csv(input_path)
+    df = _read_apec_table(input_path, year, label_column, use_cache=use_cache)
     filtered = df[(df["scenarios"] == scenario) & (df["sectors"].isin(sectors))]
     #set the year col names to ints
     filtered.columns = [int(col) if str(col).isdigit() else col for col in filtered.columns]
     
     economies = sorted(filtered["economy"].unique())
-    profiles: List[Dict] = []
+    names = _profile_names(filtered, label_column)
+    # One groupby up front instead of masking the frame per (economy, sector)
+    agg = (
+        filtered.dropna(subset=[year])
+        .groupby(["economy", "sectors", "fuels"], sort=True)[year]
+        .sum()
+    )
+    # Split the aggregate once instead of a MultiIndex lookup per (economy, sector)
+    fuel_rows: Dict[tuple, List[tuple]] = {}
+    for (economy, sector, fuel), val in zip(agg.index.tolist(), agg.tolist()):
+        fuel_rows.setdefault((economy, sector), []).append((fuel, val))
+    built = [
+        build_profile(fuel_rows, economy, sectors, names[economy], source=source)
+        for economy in economies
+    ]
+    if not skip_charts and built:
+        # Chart hashes live next to the input (not in the published charts dir);
+        # only economies whose chart inputs changed or whose PNG is missing are redrawn
+        cache_file = input_path.with_name(f"{input_path.stem}.charts.json")
+        hashes = {p["economy"]: _chart_digest(p, sectors, year) for p in built}
+        reuse = use_cache and not force_charts
+        cached = _load_chart_hashes(cache_file, charts_dir) if reuse else {}
+        stale = [
+            p
+            for p in built
+            if cached.get(p["economy"]) != hashes[p["economy"]]
+            or not (charts_dir / f"{p['economy']}.png").exists()
+        ]
+        if stale:
+            # Charts are independent and CPU-bound: render them across processes
+            with ProcessPoolExecutor(
+                max_workers=min(len(stale), os.cpu_count() or 1),
+                initializer=_init_chart_worker,
+                initargs=(sectors, year, charts_dir),
+            ) as pool:
+                list(pool.map(_render_chart_worker, stale, chunksize=2))
+        for profile in built:
+            profile["chartImage"] = f"{profile['economy']}.png"
+        # Drop the per-economy .hash sidecars older versions wrote into the charts dir
+        for sidecar in charts_dir.glob("*.hash"):
+            sidecar.unlink(missing_ok=True)
+        _save_chart_hashes(cache_file, charts_dir, hashes)
 
-    for economy in economies:
-        profile = build_profile(
-            filtered,
-            economy,
-            sectors,
-            year,
-            label_column,
-            source=source,
-        )
-        if not skip_charts:
-            profile["chartImage"] = render_charts(
-                profile, sectors, year, charts_dir
-            )
-        # Compute net imports if imports/exports are present
-        imports = profile["sectors"].get("02_imports", [])
-        exports = profile["sectors"].get("03_exports", [])
-        if imports or exports:
-            net_map: Dict[str, float] = {}
-            for item in imports:
-                net_map[item["fuel"]] = net_map.get(item["fuel"], 0.0) + item["value"]
-            for item in exports:
-                net_map[item["fuel"]] = net_map.get(item["fuel"], 0.0) + item["value"]
-            profile["sectors"]["net_imports"] = [
-                {"fuel": f, "value": v} for f, v in sorted(net_map.items())
-            ]
+    profiles: List[Dict] = []
+    for profile in built:
+        _add_net_imports(profile["sectors"])
         profile["sectors"] = _prune_sectors(
             profile["sectors"], aggregate_tfc=True, fuel_mapper=_map_apec_fuel
         )
-        profile = _attach_metrics(profile, exports_negative=False)
-        _validate_metrics(profile)
+        profile = _finalize_metrics(profile, exports_negative=False)
         profiles.append(profile)
 
     dataset = {
@@ -702,7 +1227,7 @@ def generate_apec_assets(
     }
 
     output_json.parent.mkdir(parents=True, exist_ok=True)
-    output_json.write_text(json.dumps(dataset, indent=2))
+    _dump_json(dataset, output_json)
     print(f"[INFO] Wrote {len(profiles)} APEC profiles to {output_json}")
     _write_group_shards(dataset, output_json)
     return len(profiles)
@@ -744,6 +1269,7 @@ def _map_economy_code(ref_area: str, label: str) -> tuple[str, str]:
     return fallback_code, label
 
 
+@lru_cache(maxsize=4096)
 def _classify_fuel(commodity_label: str) -> str:
     """
     Explicitly map UN commodity labels to coarse fuel buckets.
@@ -752,65 +1278,82 @@ def _classify_fuel(commodity_label: str) -> str:
     return map_un_fuel(commodity_label)
 
 
+# Ordered (pattern, sector) rules for transaction labels. Each pattern is anchored
+# at the start of the label, so alternation order keeps the rule precedence.
+_SECTOR_RULES = (
+    (r"(?=.*production)", "01_production"),
+    (r"imports\Z", "02_imports"),
+    (r"exports\Z", "03_exports"),
+    (r"(?=.*total energy supply)", "07_total_primary_energy_supply"),
+    (r"transformation", "09_total_transformation_sector"),
+    (r"final (?:energy )?consumption\Z", "12_total_final_consumption"),
+    (r"(?=.*transport)", "15_transport_sector"),
+    (r"(?=.*(?:manufacturing|industry))", "14_industry_sector"),
+    (r"(?=.*(?:household|commerce))", "16_buildings_sector"),
+    (r"(?=.*other)", "16_other_sector"),
+    (r"(?=.*non-energy)", "17_nonenergy_use"),
+)
+_SECTOR_PATTERN = re.compile("|".join(f"({pattern})" for pattern, _ in _SECTOR_RULES), re.DOTALL)
+
+
+@lru_cache(maxsize=4096)
 def _classify_sector(tx_label: str, unit_measure: str | None, commodity_label: str | None) -> str | None:
     """
     Map transaction labels to target sectors.
     """
     lbl = tx_label.lower()
-    commodity = (commodity_label or "").lower()
-    if lbl == "production" and commodity in ELEC_PRODUCTION_LABELS:
+    if lbl == "production" and (commodity_label or "").lower() in ELEC_PRODUCTION_LABELS:
         return "18_electricity_output_in_gwh"
-    if "production" in lbl:
-        return "01_production"
-    if lbl == "imports":
-        return "02_imports"
-    if lbl == "exports":
-        return "03_exports"
-    if "total energy supply" in lbl:
-        return "07_total_primary_energy_supply"
-    if lbl.startswith("transformation"):
-        return "09_total_transformation_sector"
-    if lbl == "final energy consumption" or lbl == "final consumption":
-        return "12_total_final_consumption"
-    if "transport" in lbl:
-        return "15_transport_sector"
-    if "manufacturing" in lbl or "industry" in lbl:
-        return "14_industry_sector"
-    if "household" in lbl or "commerce" in lbl:
-        return "16_buildings_sector"
-    if "other" in lbl:
-        return "16_other_sector"
-    if "non-energy" in lbl:
-        return "17_nonenergy_use"
-    return None
+    match = _SECTOR_PATTERN.match(lbl)
+    return _SECTOR_RULES[match.lastindex - 1][1] if match else None
 
 
-def generate_un_assets(
+def _strip_label(value) -> str:
+    """
+    Normalise a raw CSV cell to a stripped string label.
+    """
+    return str(value).strip()
+
+
+def _map_unique(func, *columns: pd.Series) -> pd.Series:
+    """
+    Apply a scalar mapper once per distinct value (or value tuple) of the given
+    columns and broadcast the results back onto their rows.
+    """
+    if len(columns) == 1:
+        codes, uniques = pd.factorize(columns[0], use_na_sentinel=False)
+        mapped = [func(u) for u in uniques]
+    else:
+        codes, uniques = pd.MultiIndex.from_arrays(list(columns)).factorize()
+        mapped = [func(*u) for u in uniques]
+    lookup = np.empty(len(mapped), dtype=object)
+    lookup[:] = mapped
+    return pd.Series(lookup[codes], index=columns[0].index)
+
+
+def _iter_un_year_datasets(
     input_path: Path,
-    output_json: Path,
     years: List[int],
     scenario: str,
     sectors: List[str],
-    index_json: Optional[Path] = None,
     chunksize: int = 50000,
-) -> int:
+    use_cache: bool = True,
+) -> Iterator[tuple[str, Dict]]:
     """
-    Aggregate UN labeled CSV (energy_obs_labeled.csv) into energy profile JSON.
+    Aggregate UN labeled CSV (energy_obs_labeled.csv) and return a generator of
+    (year, dataset) pairs; the CSV is consumed up front, profiles are built per year.
     """
     year_set = {str(y) for y in years}
     totals_by_year: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {
-        str(y): {} for y in years
+        str(y): _nested_totals() for y in years
     }
+    fuel_totals: Counter = Counter()
     names: Dict[str, str] = {}
-    seen_fuels: Dict[str, Dict[str, set[str]]] = {str(y): {} for y in years}
     stats = {
         "skipped_unit": 0,
         "skipped_sector": 0,
         "processed_rows": 0,
     }
-    prod_kept: set[str] = set()
-    prod_dropped_mapped: set[str] = set()
-    prod_dropped_labels: set[str] = set()
     prod_mapped: set[str] = set()
 
     usecols = [
@@ -824,136 +1367,101 @@ def generate_un_assets(
         "VALUE_PJ",
     ]
 
+    # Labels/years arrive as text and values as float64 without inference; REF_AREA keeps
+    # its inferred (numeric) type because economy fallback codes are built from it
+    column_types = None
+    if pa_csv is not None:
+        column_types = {
+            "REF_AREA_LABEL": pa.string(),
+            "COMMODITY_LABEL": pa.string(),
+            "TRANSACTION_LABEL": pa.string(),
+            "UNIT_MEASURE": pa.string(),
+            "TIME_PERIOD": pa.string(),
+            "OBS_VALUE_SCALED": pa.float64(),
+            "VALUE_PJ": pa.float64(),
+        }
+
     allowed_units = {"PJ", "TJ", "GWHR", "TN", "M3"}
 
-    for chunk in pd.read_csv(input_path, usecols=usecols, chunksize=chunksize):
+    for chunk in _iter_csv_chunks(
+        input_path, chunksize, usecols=usecols, use_cache=use_cache, column_types=column_types
+    ):
         chunk["TIME_PERIOD"] = chunk["TIME_PERIOD"].astype(str)
         chunk = chunk[chunk["TIME_PERIOD"].isin(year_set)]
         if chunk.empty:
             continue
-
-        for _, row in chunk.iterrows():
-            stats["processed_rows"] += 1
-            year_str = str(row["TIME_PERIOD"])
-            raw_lbl_full = str(row["COMMODITY_LABEL"]).strip()
-            raw_lbl = raw_lbl_full.lower()
-            tx_label = str(row["TRANSACTION_LABEL"])
-            sector = _classify_sector(tx_label, str(row["UNIT_MEASURE"]), raw_lbl_full)
-            if not sector:
-                stats["skipped_sector"] += 1
-                continue
-            unit_measure = str(row["UNIT_MEASURE"]).upper()
-            if unit_measure not in allowed_units:
-                stats["skipped_unit"] += 1
-                continue
-
-            ref_area = str(row["REF_AREA"])
-            area_label = str(row["REF_AREA_LABEL"])
-            econ_code, econ_name = _map_economy_code(ref_area, area_label)
-            names[econ_code] = econ_name
-
-            raw_lbl_full = str(row["COMMODITY_LABEL"]).strip()
-            raw_lbl = raw_lbl_full.lower()
-            fuel = _classify_fuel(raw_lbl_full)
-            # Value selection
-            val = pd.to_numeric(row["VALUE_PJ"], errors="coerce")
-            if pd.isna(val):
-                continue
-            if sector == "01_production":
-                prod_mapped.add(fuel)
-                if raw_lbl in PRODUCTION_DROP_LABELS:
-                    prod_dropped_mapped.add(fuel)
-                    prod_dropped_labels.add(raw_lbl)
-                    continue
-                if raw_lbl not in PRIMARY_PRODUCTION_LABELS_KEEP:
-                    raise RuntimeError(
-                        f"Production label not classified for keep/drop: {raw_lbl_full}"
-                    )
-                prod_kept.add(fuel)
-            seen_fuels.setdefault(year_str, {}).setdefault(econ_code, set()).add(fuel)
-
-            if sector == "03_exports":
-                val = -float(val)
-
-            econ_entry = totals_by_year[year_str].setdefault(econ_code, {})
-            fuel_map = econ_entry.setdefault(sector, {})
-            fuel_map[fuel] = fuel_map.get(fuel, 0.0) + float(val)
-
-    # Net imports computation
-    datasets: Dict[str, Dict] = {}
-    profile_counts: List[int] = []
-    for year_str in sorted(totals_by_year.keys()):
-        econ_totals = totals_by_year[year_str]
-        for econ_code, econ_entry in econ_totals.items():
-            imports = econ_entry.get("02_imports", {})
-            exports = econ_entry.get("03_exports", {})
-            net: Dict[str, float] = {}
-            for fuel in set(imports.keys()).union(exports.keys()):
-                net[fuel] = imports.get(fuel, 0.0) + exports.get(fuel, 0.0)
-            econ_entry["net_imports"] = net
-
-        profiles: List[Dict] = []
-        for econ_code in sorted(econ_totals.keys()):
-            sector_data = {}
-            for sector in sectors:
-                fuel_map = econ_totals[econ_code].get(sector, {})
-                sector_data[sector] = [
-                    {"fuel": fuel, "value": float(val)}
-                    for fuel, val in sorted(fuel_map.items())
-                ]
-            # Recompute TFC by fuel from end-use sectors
-            tfc_fuels: Dict[str, float] = {}
-            for part in [
-                "14_industry_sector",
-                "15_transport_sector",
-                "16_buildings_sector",
-                "16_other_sector",
-                "17_nonenergy_use",
-            ]:
-                for f in sector_data.get(part, []):
-                    tfc_fuels[f["fuel"]] = tfc_fuels.get(f["fuel"], 0.0) + f["value"]
-            if tfc_fuels:
-                sector_data["12_total_final_consumption"] = [
-                    {"fuel": fuel, "value": val}
-                    for fuel, val in sorted(tfc_fuels.items())
-                ]
-            sector_data = _prune_sectors(sector_data, aggregate_tfc=True)
-
-            # Validate TFC vs sum of end-use sectors
-            end_use_keys = [
-                "14_industry_sector",
-                "15_transport_sector",
-                "16_buildings_sector",
-                "16_other_sector",
-                "17_nonenergy_use",
-            ]
-            end_use_sum = 0.0
-            for k in end_use_keys:
-                for f in sector_data.get(k, []):
-                    end_use_sum += float(f.get("value", 0) or 0)
-            tfc_sum = sum(float(f.get("value", 0) or 0) for f in sector_data.get("12_total_final_consumption", []))
-            if abs(end_use_sum - tfc_sum) > max(1.0, 0.01 * abs(tfc_sum)):
-                print(
-                    f"[WARN] TFC mismatch for {econ_code} {year_str}: end-use sum={end_use_sum} vs tfc={tfc_sum}"
+        # Coerce the value column once per chunk instead of once per row
+        chunk["VALUE_PJ"] = pd.to_numeric(chunk["VALUE_PJ"], errors="coerce")
+        stats["processed_rows"] += len(chunk)
+
+        # Classify each distinct label once and broadcast back to the rows
+        commodity = _map_unique(_strip_label, chunk["COMMODITY_LABEL"])
+        raw_lbl = _map_unique(lambda v: str(v).strip().lower(), chunk["COMMODITY_LABEL"])
+        tx_label = _map_unique(str, chunk["TRANSACTION_LABEL"])
+        sector = _map_unique(lambda t, c: _classify_sector(t, None, c), tx_label, raw_lbl)
+        has_sector = sector.notna()
+        stats["skipped_sector"] += int((~has_sector).sum())
+        unit_measure = _map_unique(lambda v: str(v).upper(), chunk["UNIT_MEASURE"])
+        unit_ok = unit_measure.isin(allowed_units)
+        stats["skipped_unit"] += int((has_sector & ~unit_ok).sum())
+        keep = has_sector & unit_ok
+        if not keep.any():
+            continue
+        chunk = chunk[keep]
+        commodity = commodity[keep]
+        raw_lbl = raw_lbl[keep]
+        sector = sector[keep]
+
+        ref_area = _map_unique(str, chunk["REF_AREA"])
+        area_label = _map_unique(str, chunk["REF_AREA_LABEL"])
+        econ_code = _map_unique(lambda r, l: _map_economy_code(r, l)[0], ref_area, area_label)
+        econ_name = _map_unique(lambda r, l: _map_economy_code(r, l)[1], ref_area, area_label)
+        last_names = ~econ_code.duplicated(keep="last")
+        names.update(zip(econ_code[last_names], econ_name[last_names]))
+
+        # Dict lookup in C via Series.map; same keys and error as map_un_fuel
+        fuel = raw_lbl.map(UN_FUEL_MAP)
+        unmapped = fuel.isna()
+        if unmapped.any():
+            raise RuntimeError(f"Unmapped UN fuel label: {commodity[unmapped].iloc[0]}")
+        has_value = chunk["VALUE_PJ"].notna()
+        chunk = chunk[has_value]
+        raw_lbl = raw_lbl[has_value]
+        commodity = commodity[has_value]
+        sector = sector[has_value]
+        econ_code = econ_code[has_value]
+        fuel = fuel[has_value]
+
+        is_prod = sector == "01_production"
+        if is_prod.any():
+            prod_mapped.update(fuel[is_prod].unique())
+            dropped = is_prod & raw_lbl.isin(PRODUCTION_DROP_LABELS)
+            unclassified = is_prod & ~dropped & ~raw_lbl.isin(PRIMARY_PRODUCTION_LABELS_KEEP)
+            if unclassified.any():
+                raise RuntimeError(
+                    f"Production label not classified for keep/drop: {commodity[unclassified].iloc[0]}"
                 )
+        else:
+            dropped = is_prod
 
-            profile = _attach_metrics(
-                {
-                    "economy": econ_code,
-                    "name": names.get(econ_code, econ_code),
-                    "source": "UN",
-                    "sectors": sector_data,
-                },
-                exports_negative=True,
-            )
-            _validate_metrics(profile)
-            profiles.append(profile)
-        datasets[year_str] = {
-            "year": int(year_str),
-            "scenario": scenario,
-            "profiles": profiles,
-        }
-        profile_counts.append(len(profiles))
+        values = chunk["VALUE_PJ"].where(sector != "03_exports", -chunk["VALUE_PJ"])
+        rows = pd.DataFrame(
+            {
+                "year": chunk["TIME_PERIOD"],
+                "economy": econ_code,
+                "sector": sector,
+                "fuel": fuel,
+                "value": values,
+            }
+        )[~dropped]
+        grouped = rows.groupby(["year", "economy", "sector", "fuel"], sort=False)["value"].sum()
+        fuel_totals.update(dict(zip(grouped.index.tolist(), grouped.tolist())))
+
+    # Nest the flat (year, economy, sector, fuel) totals once, after all chunks
+    for (year_str, code, sec, fuel_name), val in fuel_totals.items():
+        totals_by_year[year_str][code][sec][fuel_name] = val
+    # Every fuel seen, sorted once for all (year, economy, sector) lists below
+    fuel_order = sorted({fuel_name for _, _, _, fuel_name in fuel_totals})
 
     expected_prod = set(UN_FUEL_MAP.values())
     unexpected = prod_mapped - expected_prod
@@ -961,34 +1469,202 @@ def generate_un_assets(
         raise RuntimeError(
             f"Unexpected production fuels encountered (update keep/drop lists): {sorted(unexpected)}"
         )
+
+    def year_datasets() -> Iterator[tuple[str, Dict]]:
+        for year_str in sorted(totals_by_year):
+            econ_totals = totals_by_year[year_str]
+            profiles: List[Dict] = []
+            for econ_code in sorted(econ_totals):
+                econ_entry = econ_totals[econ_code]
+                # Net imports computation
+                imports = econ_entry.get("02_imports", {})
+                exports = econ_entry.get("03_exports", {})
+                econ_entry["net_imports"] = {
+                    fuel: imports.get(fuel, 0.0) + exports.get(fuel, 0.0)
+                    for fuel in imports.keys() | exports.keys()
+                }
+                sector_data = {}
+                for sector in sectors:
+                    sector_data[sector] = _fuel_list(econ_entry.get(sector, {}), fuel_order)
+                # _prune_sectors rebuilds TFC (by end-use sector) from the end-use sectors
+                sector_data = _prune_sectors(sector_data, aggregate_tfc=True)
+
+                # Validate TFC vs sum of end-use sectors
+                end_use_sum = sum(
+                    (float(f.get("value", 0) or 0) for k in END_USE_SECTORS for f in sector_data.get(k, ())),
+                    0.0,
+                )
+                tfc_sum = sum(float(f.get("value", 0) or 0) for f in sector_data.get("12_total_final_consumption", []))
+                if abs(end_use_sum - tfc_sum) > max(1.0, 0.01 * abs(tfc_sum)):
+                    print(
+                        f"[WARN] TFC mismatch for {econ_code} {year_str}: end-use sum={end_use_sum} vs tfc={tfc_sum}"
+                    )
+
+                profile = _finalize_metrics(
+                    {
+                        "economy": econ_code,
+                        "name": names.get(econ_code, econ_code),
+                        "source": "UN",
+                        "sectors": sector_data,
+                    },
+                    exports_negative=True,
+                )
+                profiles.append(profile)
+            yield year_str, {
+                "year": int(year_str),
+                "scenario": scenario,
+                "profiles": profiles,
+            }
+
     print(
         f"[INFO] UN aggregation rows processed: {stats['processed_rows']}, "
         f"skipped_sector: {stats['skipped_sector']}, skipped_unit: {stats['skipped_unit']}"
     )
+    return year_datasets()
+
+
+def generate_un_assets(
+    input_path: Path,
+    output_json: Path,
+    years: List[int],
+    scenario: str,
+    sectors: List[str],
+    index_json: Optional[Path] = None,
+    chunksize: int = 50000,
+    use_cache: bool = True,
+) -> int:
+    """
+    Aggregate UN labeled CSV (energy_obs_labeled.csv) into energy profile JSON.
+    """
+    year_datasets = _iter_un_year_datasets(input_path, years, scenario, sectors, chunksize, use_cache)
+    # Each year is written (full JSON + shards) as soon as it is built
+    counts = _write_datasets_streaming(
+        output_json, sorted(years), max(years), scenario, year_datasets
+    )
+    print(
+        f"[INFO] Wrote UN profiles for years {years} to {output_json} (group-sharded index)"
+    )
+    return sum(counts.values())
 
-    out_obj = {
+
+def build_un_profiles(
+    input_path: Path,
+    years: List[int],
+    scenario: str,
+    sectors: List[str],
+    chunksize: int = 50000,
+    use_cache: bool = True,
+) -> Dict:
+    """
+    Same payload generate_un_assets writes, kept in memory (for UN+EI without the UN-only JSON).
+    """
+    datasets = dict(_iter_un_year_datasets(input_path, years, scenario, sectors, chunksize, use_cache))
+    return {
         "years": sorted(years),
         "defaultYear": max(years),
         "scenario": scenario,
         "datasets": datasets,
     }
 
-    output_json.parent.mkdir(parents=True, exist_ok=True)
-    output_json.write_text(json.dumps(out_obj, indent=2))
-    # Write economy-group shards and an index
-    _write_group_shards(out_obj, output_json)
 
-    print(
-        f"[INFO] Wrote UN profiles for years {years} to {output_json} (group-sharded index)"
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _resolve_input(path_str: Optional[str]) -> Optional[Path]:
+    """
+    Resolve an input path as given, falling back to the repo root.
+    """
+    if not path_str:
+        return None
+    p = Path(path_str).expanduser()
+    if p.exists():
+        return p
+    p_alt = REPO_ROOT / path_str
+    return p_alt if p_alt.exists() else p
+
+
+def run_apec(
+    apec_path: Path,
+    output_json: Path,
+    charts_dir: Path,
+    apec_default_year: int,
+    scenario: str,
+    sectors: List[str],
+    apec_years: List[int],
+    label_column: str,
+    skip_charts: bool,
+    source: str,
+    use_cache: bool,
+    force_charts: bool = False,
+) -> int:
+    """
+    Generate APEC profiles from a resolved CSV or Excel input; returns the profile count.
+    """
+    if apec_path.suffix.lower() == ".csv":
+        return generate_apec_assets_csv_multi(
+            apec_path,
+            output_json,
+            years=apec_years,
+            default_year=apec_default_year,
+            scenario=scenario,
+            label_column=label_column,
+            use_cache=use_cache,
+        )
+    return generate_apec_assets(
+        apec_path,
+        output_json,
+        charts_dir,
+        apec_default_year,
+        scenario,
+        sectors,
+        label_column,
+        skip_charts,
+        source=source,
+        use_cache=use_cache,
+        force_charts=force_charts,
+    )
+
+
+def run_un(
+    un_path: Path,
+    un_output_json: Path,
+    scenario: str,
+    un_years: List[int],
+    use_cache: bool,
+    write_json: bool = True,
+) -> Union[int, Dict]:
+    """
+    Generate UN profiles (plus the group index) from a resolved labeled CSV; returns the profile count.
+    With write_json=False nothing is written and the in-memory payload is returned instead.
+    """
+    if not write_json:
+        return build_un_profiles(
+            un_path, years=un_years, scenario=scenario, sectors=UN_SECTORS, use_cache=use_cache
+        )
+    return generate_un_assets(
+        un_path,
+        un_output_json,
+        years=un_years,
+        scenario=scenario,
+        sectors=UN_SECTORS,
+        index_json=un_output_json.with_name(f"{un_output_json.stem}.index.json"),
+        use_cache=use_cache,
     )
-    return sum(profile_counts)
+
+
+def _init_workflow_worker(excel_engine: str) -> None:
+    """
+    Carry the caller's Excel engine into workflow workers (module globals are not inherited).
+    """
+    global EXCEL_ENGINE
+    EXCEL_ENGINE = excel_engine
 
 
 def run_workflow(
     apec_input: Optional[str] = "data/apec_energy.xlsx",
     un_input: Optional[str] = "scripts/un_mirror/normalized/energy_obs_labeled.csv",
     output_json: str = "public/data/energy-profiles-apec.json",
-    un_output_json: str = "public/data/energy-profiles-un.json",
+    un_output_json: Union[str, Path] = "public/data/energy-profiles-un.json",
     charts_dir: str = "public/energy-graphs",
     apec_default_year: int = 2020,
     scenario: str = "reference",
@@ -998,87 +1674,101 @@ def run_workflow(
     label_column: str = "economy",
     skip_charts: bool = False,
     source: str = DEFAULT_SOURCE,
+    use_cache: bool = True,
+    force_charts: bool = False,
+    parallel: bool = False,
+    on_un_done: Optional[Callable[[Optional[Dict]], None]] = None,
+    write_un_json: bool = True,
 ) -> tuple[int, int]:
     """
     Run APEC and UN generation workflows (usable from notebooks).
     Returns (apec_count, un_count); raises if both fail/missing.
+
+    parallel runs the two branches in separate processes. on_un_done is called in
+    this process as soon as the UN branch finishes, so follow-up steps (UN+EI) can
+    overlap a still-running APEC branch. With write_un_json=False the UN JSON is not
+    written and on_un_done receives the UN payload instead of None.
+    force_charts re-renders every chart even when its cached hash still matches.
     """
     sectors = sectors or DEFAULT_SECTORS
-    charts_dir_path = Path(charts_dir)
-
-    apec_success = False
-    un_success = False
-    apec_count = 0
-    un_count = 0
-    errors: List[str] = []
     un_years = un_years or [2010, 2020]
     apec_years = apec_years or [2010, 2015, 2020, 2025, 2030, 2035, 2040, 2045, 2050, 2055, 2060]
 
-    def _resolve(path_str: Optional[str]) -> Optional[Path]:
-        if not path_str:
-            return None
-        p = Path(path_str).expanduser()
-        if p.exists():
-            return p
-        # fallback to repo root relative to this file
-        repo_root = Path(__file__).resolve().parent.parent
-        p_alt = repo_root / path_str
-        return p_alt if p_alt.exists() else p
+    errors: List[str] = []
+    jobs: Dict[str, Callable[[], int]] = {}
 
     if apec_input:
-        apec_path = _resolve(apec_input)
+        apec_path = _resolve_input(apec_input)
         if apec_path and apec_path.exists():
-            try:
-                if apec_path.suffix.lower() == ".csv":
-                    apec_count = generate_apec_assets_csv_multi(
-                        apec_path,
-                        Path(output_json),
-                        years=apec_years,
-                        default_year=apec_default_year,
-                        scenario=scenario,
-                        label_column=label_column,
-                    )
-                else:
-                    apec_count = generate_apec_assets(
-                        apec_path,
-                        Path(output_json),
-                        charts_dir_path,
-                        apec_default_year,
-                        scenario,
-                        sectors,
-                        label_column,
-                        skip_charts,
-                        source=source,
-                    )
-                apec_success = True
-            except Exception as e:  # pragma: no cover - runtime guard
-                errors.append(f"APEC generation failed: {e}")
-                print(f"[WARN] APEC generation failed: {e}")
+            jobs["APEC"] = partial(
+                run_apec,
+                apec_path,
+                Path(output_json),
+                Path(charts_dir),
+                apec_default_year,
+                scenario,
+                sectors,
+                apec_years,
+                label_column,
+                skip_charts,
+                source,
+                use_cache,
+                force_charts,
+            )
         else:
             errors.append(f"APEC input not found: {apec_path}")
             print(f"[WARN] APEC input not found: {apec_path}")
 
     if un_input:
-        un_path = _resolve(un_input)
+        un_path = _resolve_input(un_input)
         if un_path and un_path.exists():
-            try:
-                un_index = Path(un_output_json).with_name(f"{Path(un_output_json).stem}.index.json")
-                un_count = generate_un_assets(
-                    un_path,
-                    Path(un_output_json),
-                    years=un_years,
-                    scenario=scenario,
-                    sectors=UN_SECTORS,
-                    index_json=un_index,
-                )
-                un_success = True
-            except Exception as e:  # pragma: no cover - runtime guard
-                errors.append(f"UN generation failed: {e}")
-                print(f"[WARN] UN generation failed: {e}")
+            jobs["UN"] = partial(
+                run_un, un_path, Path(un_output_json), scenario, un_years, use_cache, write_un_json
+            )
         else:
             errors.append(f"UN input not found: {un_path}")
             print(f"[WARN] UN input not found: {un_path}")
 
+    counts: Dict[str, int] = {}
+
+    def _finish(name: str, result: Callable[[], Union[int, Dict]]) -> None:
+        try:
+            value = result()
+        except Exception as e:  # pragma: no cover - runtime guard
+            errors.append(f"{name} generation failed: {e}")
+            print(f"[WARN] {name} generation failed: {e}")
+            return
+        payload = value if isinstance(value, dict) else None
+        counts[name] = (
+            sum(len(d["profiles"]) for d in payload["datasets"].values())
+            if payload is not None
+            else value
+        )
+        if name == "UN" and on_un_done is not None:
+            on_un_done(payload)
+
+    if parallel and len(jobs) > 1:
+        # No fork: callers may already have threads running (e.g. the EI preload)
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        with ProcessPoolExecutor(
+            max_workers=len(jobs),
+            mp_context=ctx,
+            initializer=_init_workflow_worker,
+            initargs=(EXCEL_ENGINE,),
+        ) as ex:
+            futures = {ex.submit(job): name for name, job in jobs.items()}
+            for fut in as_completed(futures):
+                _finish(futures[fut], fut.result)
+    else:
+        for name, job in jobs.items():
+            _finish(name, job)
+
+    apec_success = "APEC" in counts
+    un_success = "UN" in counts
+    apec_count = counts.get("APEC", 0)
+    un_count = counts.get("UN", 0)
+
     if not apec_success and not un_success:
         raise RuntimeError(
             "No datasets generated; APEC and UN generations failed or missing inputs. "
@@ -1164,6 +1854,16 @@ def main() -> None:
         action="store_true",
         help="If set, only JSON will be generated.",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always re-read the CSV/Excel inputs instead of their .parquet caches.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render every chart even when its cached hash still matches.",
+    )
 
     args = parser.parse_args()
 
@@ -1180,12 +1880,13 @@ def main() -> None:
         label_column=args.label_column,
         skip_charts=args.skip_charts,
         source=args.source,
+        use_cache=not args.no_cache,
+        force_charts=args.force,
     )
 
 #%%
 if __name__ == "__main__":
     # main()
-    import os
     os.chdir('../')
     run_workflow(
         apec_input="merged_file_energy_ALL_20250814.csv",
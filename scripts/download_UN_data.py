@@ -1,16 +1,48 @@
 #%% imports
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from functools import partial
+from itertools import islice
 from pathlib import Path
 import hashlib
+from email.utils import parsedate_to_datetime
 import json
+import os
+import re
+import shutil
+import threading
 import xml.etree.ElementTree as ET
 import time
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # pragma: no cover - optional speedup
+    _lxml_etree = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import dataset as pa_dataset
+    from pyarrow import parquet as pa_parquet
+except ImportError:  # pragma: no cover - optional speedup
+    pa = None
+    pa_csv = None
+    pa_dataset = None
+    pa_parquet = None
 
 #%% config
 @dataclass(frozen=True)
@@ -23,7 +55,7 @@ class UNDataConfig:
     # Key becomes: .{REF_AREA}.../
     out_raw_dir: Path = Path("un_mirror/raw_sdmx")
     out_manifest: Path = Path("un_mirror/manifest.json")
-    sleep_s: float = 0.25
+    sleep_s: float = 0.25  # min spacing between request starts when the server sends no rate-limit headers
     timeout_s: int = 180
     max_retries: int = 3
     retry_backoff_s: float = 5.0
@@ -37,22 +69,107 @@ def _ensure_parent(p: Path) -> None:
 def _sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
-def sdmx_get(url: str, accept: str, timeout_s: int) -> requests.Response:
+def _header_delay_s(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After / X-RateLimit-Reset value into seconds from now.
+    Accepts delta seconds, epoch seconds, or an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        n = float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    # Large values are absolute epoch timestamps, small ones are deltas
+    return max(0.0, n - time.time()) if n > 1e9 else max(0.0, n)
+
+class RateLimiter:
+    """
+    Shared request pacing driven by server rate-limit headers.
+    Request starts are always spaced by `min_interval_s` (politeness to data.un.org,
+    as before the thread pool); only starts are paced, so requests still overlap in
+    flight. A 429 or an exhausted X-RateLimit-Remaining pauses every caller until
+    the advertised reset.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def acquire(self, min_interval_s: float = 0.0) -> None:
+        # Reserve a start slot under the lock, sleep outside it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + min_interval_s
+        if slot > now:
+            time.sleep(slot - now)
+
+    def observe(self, r: requests.Response) -> None:
+        headers = r.headers
+        delay = _header_delay_s(headers.get("Retry-After"))
+        if delay is None and headers.get("X-RateLimit-Remaining", "").strip() == "0":
+            delay = _header_delay_s(headers.get("X-RateLimit-Reset"))
+        if delay is None:
+            return
+        with self._lock:
+            self._next_at = max(self._next_at, time.monotonic() + delay)
+
+_RATE_LIMITER = RateLimiter()
+
+# One pooled session so every slice reuses a kept-alive TLS connection to data.un.org;
+# sized to cover the mirror thread pool. Retries stay in fetch_area_slice.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(max_retries=0, pool_connections=64, pool_maxsize=64)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+def sdmx_get(url: str, accept: str, timeout_s: int, min_interval_s: float = 0.0) -> requests.Response:
     headers = {"Accept": accept}
-    r = requests.get(url, headers=headers, timeout=timeout_s)
+    _RATE_LIMITER.acquire(min_interval_s)
+    r = _SESSION.get(url, headers=headers, timeout=timeout_s)
+    _RATE_LIMITER.observe(r)
     r.raise_for_status()
     return r
 
 def load_manifest(path: Path) -> dict:
     if not path.exists():
         return {"downloads": {}}
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
     return json.loads(path.read_text(encoding="utf-8"))
 
-def save_manifest(path: Path, manifest: dict) -> None:
+def save_manifest(path: Path, manifest: dict, compact: bool = False) -> None:
+    """
+    Writes the manifest; `compact` skips indentation for cheap mid-run checkpoints.
+    """
     _ensure_parent(path)
-    path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    if orjson is not None:
+        option = 0 if compact else orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        path.write_bytes(orjson.dumps(manifest, option=option))
+        return
+    if compact:
+        text = json.dumps(manifest, separators=(",", ":"))
+    else:
+        text = json.dumps(manifest, indent=2, sort_keys=True)
+    path.write_text(text, encoding="utf-8")
 
 #%% codelists (REF_AREA)
+def _codelist_codes(xml: bytes) -> Iterator:
+    """
+    Parses a codelist response and yields its <Code> elements (any namespace).
+    Uses lxml when installed; the {*} path is matched in C instead of a Python tag scan.
+    """
+    if _lxml_etree is not None:
+        root = _lxml_etree.fromstring(xml)
+    else:
+        root = ET.fromstring(xml)
+    return root.iterfind(".//{*}Code")
+
 def list_ref_areas_from_codelist(cfg: UNDataConfig) -> list[str]:
     """
     Pulls the UNSD energy AREA codelist and returns numeric REF_AREA codes.
@@ -60,37 +177,24 @@ def list_ref_areas_from_codelist(cfg: UNDataConfig) -> list[str]:
     """
     # SDMX codelist endpoint
     url = f"{cfg.base_rest}/codelist/{cfg.agency}/CL_AREA_NRG/?references=none"
-    xml = sdmx_get(url, accept="application/xml", timeout_s=cfg.timeout_s).text
-
-    # Namespaced XML uses structure:Code, so match any tag ending with "Code"
-    codes: list[str] = []
-    root = ET.fromstring(xml)
-    for elem in root.iter():
-        if elem.tag.endswith("Code"):
-            code = elem.attrib.get("id")
-            if code and code.isdigit():
-                codes.append(code)
+    xml = sdmx_get(url, accept="application/xml", timeout_s=cfg.timeout_s).content
 
-    return sorted(set(codes))
+    codes = {elem.get("id") for elem in _codelist_codes(xml)}
+    return sorted(code for code in codes if code and code.isdigit())
 
 def fetch_codelist_map(code_id: str, cfg: UNDataConfig) -> dict[str, str]:
     """
     Fetches a SDMX codelist (e.g., CL_COMMODITY_NRG) and returns {code: name}.
     """
     url = f"{cfg.base_rest}/codelist/{cfg.agency}/{code_id}/?references=none"
-    xml = sdmx_get(url, accept="application/xml", timeout_s=cfg.timeout_s).text
-    root = ET.fromstring(xml)
+    xml = sdmx_get(url, accept="application/xml", timeout_s=cfg.timeout_s).content
     out: dict[str, str] = {}
-    for elem in root.iter():
-        if elem.tag.endswith("Code"):
-            code = elem.attrib.get("id")
-            label = None
-            for child in elem:
-                if child.tag.endswith("Name"):
-                    label = child.text
-                    break
-            if code and label:
-                out[code] = label
+    for elem in _codelist_codes(xml):
+        code = elem.get("id")
+        name = elem.find("{*}Name")
+        label = name.text if name is not None else None
+        if code and label:
+            out[code] = label
     return out
 
 #%% download logic
@@ -111,24 +215,65 @@ def build_data_url_for_area(
         params.append(f"endPeriod={end_year}")
     return base + key + "?" + "&".join(params)
 
-def download_area_slice(
+def _slice_id(ref_area: str, start_year: Optional[int], end_year: Optional[int]) -> str:
+    return f"{ref_area}:{start_year or 'NA'}-{end_year or 'NA'}"
+
+def _slice_path(cfg: UNDataConfig, ref_area: str, start_year: Optional[int], end_year: Optional[int]) -> Path:
+    return cfg.out_raw_dir / f"{cfg.dataflow}_area_{ref_area}_{start_year or 'NA'}_{end_year or 'NA'}.xml"
+
+_ROOT_TAG_RE = re.compile(rb"<([^?!/\s>][^\s/>]*)")
+
+def _xml_looks_complete(path: Path, size: int) -> bool:
+    """
+    Cheap completeness check: non-empty and ending with the closing tag of the root
+    element named at the top of the file. Reads only the head and tail.
+    """
+    if size == 0:
+        return False
+    with path.open("rb") as fh:
+        head = fh.read(4096)
+        fh.seek(max(0, size - 512))
+        tail = fh.read().rstrip()
+    root = _ROOT_TAG_RE.search(head)
+    return root is not None and tail.endswith(b"</" + root.group(1) + b">")
+
+def _slice_on_disk(
     cfg: UNDataConfig,
+    downloads: dict,
     ref_area: str,
     start_year: Optional[int],
     end_year: Optional[int],
-    force: bool = False,
-) -> Path:
+) -> Optional[Path]:
     """
-    Downloads one "slice" (area + optional time window) and stores XML to disk.
-    Uses the manifest to skip already-downloaded identical slices unless force=True.
+    Returns the slice's XML path when it can be skipped, judged from the file itself:
+    it must exist and, if the manifest has an ok entry, match the recorded size.
+    Files without an entry may predate atomic writes (an interrupted older run can
+    leave truncated XML), so they are kept only if _xml_looks_complete.
+    Error entries are always retried.
     """
-    manifest = load_manifest(cfg.out_manifest)
-    downloads = manifest.setdefault("downloads", {})
-
-    slice_id = f"{ref_area}:{start_year or 'NA'}-{end_year or 'NA'}"
-    if (not force) and slice_id in downloads and downloads[slice_id].get("status") == "ok":
-        return Path(downloads[slice_id]["path"])
-
+    out_path = _slice_path(cfg, ref_area, start_year, end_year)
+    try:
+        size = out_path.stat().st_size
+    except FileNotFoundError:
+        return None
+    entry = downloads.get(_slice_id(ref_area, start_year, end_year))
+    if entry is None:
+        return out_path if _xml_looks_complete(out_path, size) else None
+    if entry.get("status") == "ok" and entry.get("bytes") == size:
+        return out_path
+    return None
+
+def fetch_area_slice(
+    cfg: UNDataConfig,
+    ref_area: str,
+    start_year: Optional[int],
+    end_year: Optional[int],
+) -> tuple[str, bytes]:
+    """
+    Fetches one slice over HTTP (with retry/backoff) and returns (url, content).
+    Touches neither the disk nor the manifest, so it is safe to run from worker threads.
+    """
+    slice_id = _slice_id(ref_area, start_year, end_year)
     url = build_data_url_for_area(cfg, ref_area, start_year, end_year)
     accept = "application/vnd.sdmx.structurespecificdata+xml;version=2.1"
 
@@ -136,13 +281,18 @@ def download_area_slice(
     last_exc: requests.RequestException | None = None
     for attempt in range(cfg.max_retries):
         try:
-            r = sdmx_get(url, accept=accept, timeout_s=cfg.timeout_s)
+            r = sdmx_get(url, accept=accept, timeout_s=cfg.timeout_s, min_interval_s=cfg.sleep_s)
             break
         except requests.RequestException as e:
             last_exc = e
             is_last = attempt + 1 >= cfg.max_retries
             if is_last:
                 raise
+            resp = getattr(e, "response", None)
+            if resp is not None and resp.status_code == 429 and "Retry-After" in resp.headers:
+                # The limiter already holds every worker until the server's reset
+                print(f"[WARN] rate limited on {slice_id}, retrying after server reset")
+                continue
             delay = cfg.retry_backoff_s * (2**attempt)
             print(f"[WARN] attempt {attempt + 1}/{cfg.max_retries} failed for {slice_id}, retrying in {delay:.1f}s: {e}")
             time.sleep(delay)
@@ -151,27 +301,82 @@ def download_area_slice(
             raise last_exc
         raise RuntimeError("Unexpected retry loop exit")
 
-    content = r.content
-    sha = _sha256_bytes(content)
+    return url, r.content
 
-    out_path = cfg.out_raw_dir / f"{cfg.dataflow}_area_{ref_area}_{start_year or 'NA'}_{end_year or 'NA'}.xml"
+def _store_area_slice(
+    cfg: UNDataConfig,
+    downloads: dict,
+    ref_area: str,
+    start_year: Optional[int],
+    end_year: Optional[int],
+    url: str,
+    content: bytes,
+    sha256: Optional[str] = None,
+) -> Path:
+    """
+    Writes a fetched slice to disk and records it in `downloads` (caller saves the manifest).
+    Pass `sha256` when the digest was already computed off the writer thread.
+    """
+    out_path = _slice_path(cfg, ref_area, start_year, end_year)
     _ensure_parent(out_path)
-    out_path.write_bytes(content)
+    # Write then rename so an interrupted run never leaves a truncated slice behind
+    tmp_path = out_path.with_suffix(".xml.part")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, out_path)
 
-    downloads[slice_id] = {
+    downloads[_slice_id(ref_area, start_year, end_year)] = {
         "status": "ok",
         "ref_area": ref_area,
         "start_year": start_year,
         "end_year": end_year,
         "url": url,
         "path": str(out_path),
-        "sha256": sha,
+        "sha256": sha256 or _sha256_bytes(content),
         "bytes": len(content),
         "downloaded_at_epoch": int(time.time()),
     }
-    save_manifest(cfg.out_manifest, manifest)
+    return out_path
+
+def _fetch_and_hash_slice(
+    cfg: UNDataConfig,
+    ref_area: str,
+    start_year: Optional[int],
+    end_year: Optional[int],
+) -> tuple[str, bytes, str]:
+    """
+    Pool job: fetches a slice and hashes it in the worker thread (hashlib releases the GIL),
+    keeping SHA-256 off the single writer thread.
+    """
+    url, content = fetch_area_slice(cfg, ref_area, start_year, end_year)
+    return url, content, _sha256_bytes(content)
 
-    time.sleep(cfg.sleep_s)
+def download_area_slice(
+    cfg: UNDataConfig,
+    ref_area: str,
+    start_year: Optional[int],
+    end_year: Optional[int],
+    force: bool = False,
+    manifest: Optional[dict] = None,
+) -> Path:
+    """
+    Downloads one "slice" (area + optional time window) and stores XML to disk.
+    Skips slices already on disk (see _slice_on_disk) unless force=True.
+    When `manifest` is passed it is updated in place and the caller saves it.
+    """
+    owns_manifest = manifest is None
+    if owns_manifest:
+        manifest = load_manifest(cfg.out_manifest)
+    downloads = manifest.setdefault("downloads", {})
+
+    if not force:
+        existing = _slice_on_disk(cfg, downloads, ref_area, start_year, end_year)
+        if existing is not None:
+            return existing
+
+    url, content = fetch_area_slice(cfg, ref_area, start_year, end_year)
+    out_path = _store_area_slice(cfg, downloads, ref_area, start_year, end_year, url, content)
+    if owns_manifest:
+        save_manifest(cfg.out_manifest, manifest)
     return out_path
 
 def iter_year_windows(start: int, end: int, window: int) -> Iterable[tuple[int, int]]:
@@ -192,89 +397,175 @@ def mirror_all_areas(
     end_year: int,
     year_window: int = 10,
     force: bool = False,
+    max_workers: int = 8,
+    checkpoint_every: int = 200,
 ) -> None:
     """
     Mirrors the entire dataset by:
       - listing REF_AREA codes
       - downloading per area in year windows (keeps file sizes manageable)
+    Slices are fetched by a bounded thread pool; the main thread is the only writer
+    of XML files and the manifest, which stays in memory and is checkpointed every
+    `checkpoint_every` slices and once more on exit.
     """
     ref_areas = list_ref_areas_from_codelist(cfg)
     print(f"REF_AREA codes found: {len(ref_areas)}")
 
-    total_jobs = len(ref_areas) * len(list(iter_year_windows(start_year, end_year, year_window)))
-    job_i = 0
-
-    for ref_area in ref_areas:
-        for a, b in iter_year_windows(start_year, end_year, year_window):
-            job_i += 1
-            try:
-                p = download_area_slice(cfg, ref_area, a, b, force=force)
-                if job_i % 50 == 0:
-                    print(f"{job_i}/{total_jobs} ok (latest: {p.name})")
-            except (requests.HTTPError, requests.RequestException) as e:
-                # Record failure in manifest, continue
-                manifest = load_manifest(cfg.out_manifest)
-                downloads = manifest.setdefault("downloads", {})
-                slice_id = f"{ref_area}:{a}-{b}"
-                downloads[slice_id] = {
-                    "status": "error",
-                    "ref_area": ref_area,
-                    "start_year": a,
-                    "end_year": b,
-                    "error": str(e),
-                    "failed_at_epoch": int(time.time()),
-                }
-                save_manifest(cfg.out_manifest, manifest)
-                print(f"[WARN] failed {slice_id}: {e}")
+    manifest = load_manifest(cfg.out_manifest)
+    downloads = manifest.setdefault("downloads", {})
+    windows = tuple(iter_year_windows(start_year, end_year, year_window))
+    jobs = [(ref_area, a, b) for ref_area in ref_areas for a, b in windows]
+    total_jobs = len(ref_areas) * len(windows)
+    if not force:
+        jobs = [job for job in jobs if _slice_on_disk(cfg, downloads, *job) is None]
+    job_i = total_jobs - len(jobs)
+
+    done = 0
+    pending = iter(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            # Keep at most 2 x max_workers slices in flight, so finished payloads
+            # never pile up beyond that while the main thread writes
+            futures = {
+                ex.submit(_fetch_and_hash_slice, cfg, *job): job
+                for job in islice(pending, 2 * max_workers)
+            }
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    ref_area, a, b = futures.pop(fut)
+                    job = next(pending, None)
+                    if job is not None:
+                        futures[ex.submit(_fetch_and_hash_slice, cfg, *job)] = job
+                    slice_id = _slice_id(ref_area, a, b)
+                    job_i += 1
+                    done += 1
+                    try:
+                        url, content, sha = fut.result()
+                    except (requests.HTTPError, requests.RequestException) as e:
+                        # Record failure in manifest, continue
+                        downloads[slice_id] = {
+                            "status": "error",
+                            "ref_area": ref_area,
+                            "start_year": a,
+                            "end_year": b,
+                            "error": str(e),
+                            "failed_at_epoch": int(time.time()),
+                        }
+                        print(f"[WARN] failed {slice_id}: {e}")
+                    else:
+                        p = _store_area_slice(cfg, downloads, ref_area, a, b, url, content, sha)
+                        if job_i % 50 == 0:
+                            print(f"{job_i}/{total_jobs} ok (latest: {p.name})")
+                    if done % checkpoint_every == 0:
+                        save_manifest(cfg.out_manifest, manifest, compact=True)
+    finally:
+        save_manifest(cfg.out_manifest, manifest)
 
 #%% optional: normalize to parquet (fast querying later)
-def parse_structurespecific_minimal(xml_path: Path) -> pd.DataFrame:
+def _iterparse_ends(xml_path: Path, local_tag: str) -> Iterator:
     """
-    Minimal parser that extracts observations using pandas read_xml.
-    This works for many StructureSpecific SDMX files but can break if schema varies.
-    If it fails, keep raw XML mirrored and parse with a dedicated SDMX library.
+    Yields each element whose tag ends with `local_tag` once it is fully parsed.
+    Uses lxml (libxml2) when installed, else stdlib iterparse. Callers clear what they consume.
     """
-    # The observation nodes are often <Obs> carrying data in attributes.
-    # Try pandas first, then fall back to a manual ElementTree parse.
-    try:
-        obs = pd.read_xml(xml_path, xpath=".//Obs")
-        if obs is not None and not obs.empty:
-            return obs
-    except Exception:
-        pass
+    if _lxml_etree is not None:
+        for _, elem in _lxml_etree.iterparse(str(xml_path), events=("end",), tag=f"{{*}}{local_tag}"):
+            yield elem
+            # Drop already-consumed siblings so the tree stays O(1) per element
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+    for _, elem in ET.iterparse(xml_path, events=("end",)):
+        if elem.tag.endswith(local_tag):
+            yield elem
 
-    # Manual fallback: grab <Obs> nodes and turn their attributes into rows.
+def parse_structurespecific_minimal(xml_path: Path) -> pd.DataFrame:
+    """
+    Minimal parser that turns every <Obs> node's attributes into a row.
+    Streams the XML, then applies the same dtype inference pd.read_xml does
+    (its TextParser), so numeric columns such as TIME_PERIOD come back typed.
+    Ignores Series attributes; see parse_structurespecific_with_series for the merged view.
+    """
     try:
-        root = ET.parse(xml_path).getroot()
-        rows = [dict(elem.attrib) for elem in root.iter() if elem.tag.endswith("Obs")]
-        return pd.DataFrame(rows)
+        rows = []
+        for obs in _iterparse_ends(xml_path, "Obs"):
+            rows.append(dict(obs.attrib))
+            obs.clear()
+        if not rows:
+            return pd.DataFrame()
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        with TextParser([[row.get(col) for col in columns] for row in rows], names=columns) as tp:
+            return tp.read()
     except Exception:
         return pd.DataFrame()
 
+def _iter_series_obs(xml_path: Path) -> Iterator[tuple[dict, object]]:
+    """
+    Single streaming pass over Series/Obs: yields (series attributes, Obs element) for each
+    Obs inside a Series. Series attributes are read on the start event; Obs are cleared
+    after use and consumed siblings are detached, so memory stays flat.
+    """
+    if _lxml_etree is not None:
+        context = _lxml_etree.iterparse(
+            str(xml_path), events=("start", "end"), tag=("{*}Series", "{*}Obs")
+        )
+    else:
+        context = ET.iterparse(xml_path, events=("start", "end"))
+
+    sattrs: Optional[dict] = None
+    for event, elem in context:
+        tag = elem.tag
+        if tag.endswith("Series"):
+            if event == "start":
+                sattrs = dict(elem.attrib)
+                continue
+            sattrs = None
+        elif tag.endswith("Obs"):
+            if event == "start":
+                continue
+            if sattrs is not None:
+                yield sattrs, elem
+        else:
+            continue
+        elem.clear()
+        if _lxml_etree is not None:
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
 def parse_structurespecific_with_series(xml_path: Path) -> pd.DataFrame:
     """
     Parses StructureSpecific XML and merges Series attributes into each Obs row.
+    Streams one element at a time so memory does not grow with file size.
     """
+    # Column lists (SoA) instead of a dict per row; keys first seen later are back-filled
+    cols: dict[str, list] = {}
+    n = 0
     try:
-        root = ET.parse(xml_path).getroot()
+        for sattrs, obs in _iter_series_obs(xml_path):
+            for key, value in sattrs.items():
+                col = cols.get(key)
+                if col is None:
+                    col = cols[key] = [None] * n
+                col.append(value)
+            for key, value in obs.attrib.items():
+                col = cols.get(key)
+                if col is None:
+                    col = cols[key] = [None] * n
+                if len(col) > n:
+                    col[n] = value  # Obs attribute overrides the Series one
+                else:
+                    col.append(value)
+            n += 1
+            for col in cols.values():
+                if len(col) < n:
+                    col.append(None)
     except Exception:
         return pd.DataFrame()
-
-    rows = []
-    for series in root.iter():
-        if not series.tag.endswith("Series"):
-            continue
-        sattrs = dict(series.attrib)
-        for obs in series.iter():
-            if not obs.tag.endswith("Obs"):
-                continue
-            row = {**sattrs, **obs.attrib}
-            rows.append(row)
-    return pd.DataFrame(rows)
+    return pd.DataFrame(cols)
 
 def build_energy_codelists(cfg: UNDataConfig) -> dict[str, dict[str, str]]:
     """
-    Fetches the key energy codelists and returns a mapping per dimension.
+    Fetches the key energy codelists concurrently and returns a mapping per dimension.
     """
     id_map = {
         "REF_AREA": "CL_AREA_NRG",
@@ -282,12 +573,46 @@ def build_energy_codelists(cfg: UNDataConfig) -> dict[str, dict[str, str]]:
         "TRANSACTION": "CL_TRANSACTION_NRG",
         "UNIT_MEASURE": "CL_UNIT_NRG",
     }
-    out: dict[str, dict[str, str]] = {}
-    for col, code_id in id_map.items():
+
+    def fetch(code_id: str) -> Optional[dict[str, str]]:
+        # Catch per codelist so one failure does not drop the others
         try:
-            out[col] = fetch_codelist_map(code_id, cfg)
+            return fetch_codelist_map(code_id, cfg)
         except requests.RequestException as e:
             print(f"[WARN] failed to fetch {code_id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(id_map)) as ex:
+        results = dict(zip(id_map, ex.map(fetch, id_map.values())))
+    return {col: cmap for col, cmap in results.items() if cmap is not None}
+
+# Conversions to petajoules, applied in _enrich_labels_and_numeric
+UNIT_TO_PJ = {
+    "PJ": 1.0,
+    "TJ": 1 / 1000.0,
+    "GWHR": 0.0036,  # 1 GWh = 3.6 TJ
+}
+COMMODITY_GJ_PER_TONNE = {
+    "0100": 25.8,  # Hard Coal (matches sample conversion factor in feed)
+    "0110": 27.0,  # Anthracite
+    "0121": 28.0,  # Coking coal
+    "0129": 25.0,  # Other bituminous coal
+    "0200": 10.0,  # Brown coal / lignite (typical low CV)
+}
+COMMODITY_GJ_PER_M3 = {
+    "2300": 0.038,  # Natural gas (approx 38 MJ/m3)
+}
+
+def _map_codes(s: pd.Series, mapping: dict, dtype=object) -> np.ndarray:
+    """
+    Maps a column through `mapping` once per distinct value and broadcasts back by code.
+    Missing keys (and missing values) come back as NaN.
+    """
+    codes, uniques = pd.factorize(s)
+    table = pd.Series(uniques, dtype=object).map(mapping).to_numpy(dtype=dtype)
+    out = table.take(codes, mode="clip") if len(table) else np.full(len(s), np.nan, dtype=dtype)
+    if len(table) and (codes < 0).any():
+        out[codes < 0] = np.nan
     return out
 
 def _enrich_labels_and_numeric(df: pd.DataFrame, label_maps: dict[str, dict[str, str]]) -> pd.DataFrame:
@@ -299,118 +624,227 @@ def _enrich_labels_and_numeric(df: pd.DataFrame, label_maps: dict[str, dict[str,
 
     for col, cmap in label_maps.items():
         if col in df.columns:
-            df[f"{col}_LABEL"] = df[col].map(cmap)
+            df[f"{col}_LABEL"] = _map_codes(df[col], cmap)
 
     if "OBS_VALUE" in df.columns:
         df["OBS_VALUE_NUM"] = pd.to_numeric(df["OBS_VALUE"], errors="coerce")
     if "UNIT_MULT" in df.columns:
         df["UNIT_MULT_INT"] = pd.to_numeric(df["UNIT_MULT"], errors="coerce")
     if "OBS_VALUE_NUM" in df.columns and "UNIT_MULT_INT" in df.columns:
-        df["OBS_VALUE_SCALED"] = df["OBS_VALUE_NUM"] * (10 ** df["UNIT_MULT_INT"].fillna(0))
+        mult = df["UNIT_MULT_INT"].to_numpy(dtype=float, na_value=np.nan)
+        df["OBS_VALUE_SCALED"] = df["OBS_VALUE_NUM"].to_numpy(dtype=float, na_value=np.nan) * np.power(
+            10.0, np.nan_to_num(mult, nan=0.0)
+        )
+
+    n = len(df)
+    if "OBS_VALUE_SCALED" in df.columns:
+        qty = df["OBS_VALUE_SCALED"].to_numpy(dtype=float, na_value=np.nan)
+    elif "OBS_VALUE_NUM" in df.columns:
+        qty = df["OBS_VALUE_NUM"].to_numpy(dtype=float, na_value=np.nan)
+    else:
+        df["VALUE_PJ"] = np.full(n, np.nan)
+        return df
 
-    # Convert to petajoules
-    unit_to_pj = {
-        "PJ": 1.0,
-        "TJ": 1 / 1000.0,
-        "GWHR": 0.0036,  # 1 GWh = 3.6 TJ
-    }
-    commodity_gj_per_tonne = {
-        "0100": 25.8,  # Hard Coal (matches sample conversion factor in feed)
-        "0110": 27.0,  # Anthracite
-        "0121": 28.0,  # Coking coal
-        "0129": 25.0,  # Other bituminous coal
-        "0200": 10.0,  # Brown coal / lignite (typical low CV)
-    }
-    commodity_gj_per_m3 = {
-        "2300": 0.038,  # Natural gas (approx 38 MJ/m3)
-    }
+    # Fallback chain, first hit wins: unit factor, CONVERSION_FACTOR (assume GJ/unit),
+    # then commodity calorific values for TN and M3.
+    value = np.full(n, np.nan)
+    if "UNIT_MEASURE" in df.columns:
+        unit = df["UNIT_MEASURE"]
+        value = qty * _map_codes(unit, UNIT_TO_PJ, dtype=float)
+    if "CONVERSION_FACTOR" in df.columns:
+        conv = pd.to_numeric(df["CONVERSION_FACTOR"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        value = np.where(np.isnan(value), qty * conv / 1_000_000, value)  # GJ -> PJ
+    if "UNIT_MEASURE" in df.columns and "COMMODITY" in df.columns:
+        unit_codes, unit_uniques = pd.factorize(df["UNIT_MEASURE"])
+        unit_uniques = list(unit_uniques)
+        commodity = df["COMMODITY"]
+        missing = np.isnan(value)
+        for unit_code, gj_map in (("TN", COMMODITY_GJ_PER_TONNE), ("M3", COMMODITY_GJ_PER_M3)):
+            if unit_code not in unit_uniques:
+                continue
+            cond = missing & (unit_codes == unit_uniques.index(unit_code))
+            if cond.any():
+                value = np.where(cond, qty * _map_codes(commodity, gj_map, dtype=float) / 1_000_000, value)
+    df["VALUE_PJ"] = value
+    return df
 
-    df["VALUE_PJ"] = pd.NA
+_WORKER_LABEL_MAPS: Optional[dict[str, dict[str, str]]] = None
 
-    if "UNIT_MEASURE" in df.columns:
-        factors = df["UNIT_MEASURE"].map(unit_to_pj)
-        if "OBS_VALUE_SCALED" in df.columns:
-            df["VALUE_PJ"] = df["OBS_VALUE_SCALED"] * factors
-        elif "OBS_VALUE_NUM" in df.columns:
-            df["VALUE_PJ"] = df["OBS_VALUE_NUM"] * factors
-
-    # Fallback: if VALUE_PJ still missing and CONVERSION_FACTOR provided (assume GJ/unit)
-    if "VALUE_PJ" in df.columns and "CONVERSION_FACTOR" in df.columns:
-        mask = df["VALUE_PJ"].isna()
-        if mask.any():
-            conv = pd.to_numeric(df.loc[mask, "CONVERSION_FACTOR"], errors="coerce")
-            if "OBS_VALUE_SCALED" in df.columns:
-                qty = df.loc[mask, "OBS_VALUE_SCALED"]
-            else:
-                qty = df.loc[mask, "OBS_VALUE_NUM"]
-            df.loc[mask, "VALUE_PJ"] = qty * conv / 1_000_000  # GJ -> PJ
-
-    # Fallback: commodity-based calorific values for TN and M3 when no conversion factor present
-    if "VALUE_PJ" in df.columns and "UNIT_MEASURE" in df.columns and "COMMODITY" in df.columns:
-        # Tonnes
-        mask_tn = df["VALUE_PJ"].isna() & (df["UNIT_MEASURE"] == "TN")
-        if mask_tn.any():
-            gj_per_tonne = df.loc[mask_tn, "COMMODITY"].map(commodity_gj_per_tonne)
-            qty = df.loc[mask_tn, "OBS_VALUE_SCALED"]
-            df.loc[mask_tn, "VALUE_PJ"] = qty * gj_per_tonne / 1_000_000
-        # Cubic meters
-        mask_m3 = df["VALUE_PJ"].isna() & (df["UNIT_MEASURE"] == "M3")
-        if mask_m3.any():
-            gj_per_m3 = df.loc[mask_m3, "COMMODITY"].map(commodity_gj_per_m3)
-            qty = df.loc[mask_m3, "OBS_VALUE_SCALED"]
-            df.loc[mask_m3, "VALUE_PJ"] = qty * gj_per_m3 / 1_000_000
+def _init_parse_worker(label_maps: Optional[dict[str, dict[str, str]]]) -> None:
+    global _WORKER_LABEL_MAPS
+    _WORKER_LABEL_MAPS = label_maps
+
+def _parse_mirror_file(xml_path: Path) -> pd.DataFrame:
+    """
+    Worker: parses one XML slice, tags its source file and enriches it when label maps were given.
+    """
+    df = parse_structurespecific_with_series(xml_path)
+    if not df.empty:
+        df["__source_file"] = xml_path.name
+        if _WORKER_LABEL_MAPS is not None:
+            df = _enrich_labels_and_numeric(df, _WORKER_LABEL_MAPS)
     return df
 
+def _iter_parsed_mirror(
+    files: list[Path],
+    label_maps: Optional[dict[str, dict[str, str]]] = None,
+    max_workers: Optional[int] = None,
+    worker: Callable[[Path], object] = _parse_mirror_file,
+) -> Iterator:
+    """
+    Runs `worker` (default: parse to a table) over files in a process pool, yielding in input order.
+    Label maps reach the workers once via the pool initializer.
+    """
+    if not files:
+        return
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_parse_worker,
+        initargs=(label_maps,),
+    ) as ex:
+        yield from ex.map(worker, files, chunksize=8)
+
+# Obs/Series attributes every slice should carry; sporadic ones (CONVERSION_FACTOR) are
+# pre-declared so streamed output columns do not depend on which file comes first.
+SDMX_OBS_COLUMNS = (
+    "FREQ",
+    "REF_AREA",
+    "COMMODITY",
+    "TRANSACTION",
+    "UNIT_MEASURE",
+    "UNIT_MULT",
+    "TIME_PERIOD",
+    "OBS_VALUE",
+    "CONVERSION_FACTOR",
+)
+NUMERIC_COLUMNS = ("OBS_VALUE_NUM", "UNIT_MULT_INT", "OBS_VALUE_SCALED", "VALUE_PJ")
+
+def _iter_aligned_frames(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Skips empty chunks and reindexes the rest to one column list, fixed on the first chunk
+    (plus SDMX_OBS_COLUMNS). Columns first seen later are dropped with a warning.
+    """
+    names: Optional[list[str]] = None
+    warned: set[str] = set()
+    for df in chunks:
+        if df.empty:
+            continue
+        if names is None:
+            names = list(df.columns) + [c for c in SDMX_OBS_COLUMNS if c not in df.columns]
+        extra = [c for c in df.columns if c not in names and c not in warned]
+        if extra:
+            warned.update(extra)
+            print(f"[WARN] dropping columns not in the output schema: {extra}")
+        yield df.reindex(columns=names)
+
+def _iter_arrow_tables(chunks: Iterable[pd.DataFrame]) -> Iterator:
+    """
+    Converts aligned chunks to Arrow tables sharing one schema
+    (strings, numeric enrichment columns as float64).
+    """
+    schema = None
+    for df in _iter_aligned_frames(chunks):
+        if schema is None:
+            schema = pa.schema(
+                [(c, pa.float64() if c in NUMERIC_COLUMNS else pa.string()) for c in df.columns]
+            )
+        for c in NUMERIC_COLUMNS:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors="coerce")
+        yield pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def _write_parquet_stream(chunks: Iterable[pd.DataFrame], out_parquet: Path) -> int:
+    """
+    Writes each non-empty chunk as its own row group so only one file's rows are in memory.
+    Falls back to concat + to_parquet without pyarrow.
+    """
+    if pa_parquet is None:
+        frames = [df for df in chunks if not df.empty]
+        if not frames:
+            return 0
+        out = pd.concat(frames, ignore_index=True)
+        out.to_parquet(out_parquet, index=False)
+        return len(out)
+
+    writer = None
+    rows = 0
+    try:
+        for table in _iter_arrow_tables(chunks):
+            if writer is None:
+                writer = pa_parquet.ParquetWriter(out_parquet, table.schema, compression="zstd")
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def _write_csv_stream(chunks: Iterable[pd.DataFrame], out_csv: Path) -> int:
+    """
+    Streams chunks into one CSV opened (and truncated) once, with a single header.
+    Uses pyarrow's CSV writer when installed, else pandas to_csv on the same handle.
+    """
+    rows = 0
+    with open(out_csv, "wb") as fh:
+        if pa_csv is not None:
+            writer = None
+            try:
+                for table in _iter_arrow_tables(chunks):
+                    if writer is None:
+                        writer = pa_csv.CSVWriter(fh, table.schema)
+                    writer.write_table(table)
+                    rows += table.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+            return rows
+        for df in _iter_aligned_frames(chunks):
+            df.to_csv(fh, header=rows == 0, index=False)
+            rows += len(df)
+    return rows
+
 def normalize_mirror_to_parquet(
     raw_dir: Path,
     out_parquet: Path = Path("un_mirror/normalized/energy_obs.parquet"),
+    max_workers: Optional[int] = None,
 ) -> None:
     """
     Converts mirrored XML slices into one Parquet dataset.
-    Keeps it simple: concatenates per-file Obs tables.
+    Streams per-file Obs tables into row groups of a single file.
     """
     files = sorted(raw_dir.glob("*.xml"))
     _ensure_parent(out_parquet)
 
-    chunks = []
-    for i, f in enumerate(files, start=1):
-        df = parse_structurespecific_with_series(f)
-        if not df.empty:
-            df["__source_file"] = f.name
-            chunks.append(df)
-        if i % 100 == 0:
-            print(f"parsed {i}/{len(files)}")
+    def chunks() -> Iterator[pd.DataFrame]:
+        for i, df in enumerate(_iter_parsed_mirror(files, None, max_workers), start=1):
+            yield df
+            if i % 100 == 0:
+                print(f"parsed {i}/{len(files)}")
 
-    if not chunks:
+    rows_written = _write_parquet_stream(chunks(), out_parquet)
+    if rows_written == 0:
         raise RuntimeError("No observations parsed. Keep raw XML and use an SDMX parser library instead.")
-
-    out = pd.concat(chunks, ignore_index=True)
-    out.to_parquet(out_parquet, index=False)
-    print(f"Wrote {len(out):,} rows to {out_parquet}")
+    print(f"Wrote {rows_written:,} rows to {out_parquet}")
 
 def export_mirror_to_csv(
     raw_dir: Path,
     out_csv: Path = Path("un_mirror/normalized/energy_obs.csv"),
+    max_workers: Optional[int] = None,
 ) -> None:
     """
     Converts mirrored XML slices into one CSV file.
-    Writes incrementally to avoid holding everything in memory.
+    Writes incrementally through one open handle to avoid holding everything in memory.
     """
     files = sorted(raw_dir.glob("*.xml"))
     _ensure_parent(out_csv)
-    if out_csv.exists():
-        out_csv.unlink()
 
-    rows_written = 0
-    for i, f in enumerate(files, start=1):
-        df = parse_structurespecific_with_series(f)
-        if not df.empty:
-            df["__source_file"] = f.name
-            df.to_csv(out_csv, mode="a", header=not out_csv.exists(), index=False)
-            rows_written += len(df)
-        if i % 100 == 0:
-            print(f"csv: processed {i}/{len(files)} files")
+    def chunks() -> Iterator[pd.DataFrame]:
+        for i, df in enumerate(_iter_parsed_mirror(files, None, max_workers), start=1):
+            yield df
+            if i % 100 == 0:
+                print(f"csv: processed {i}/{len(files)} files")
 
+    rows_written = _write_csv_stream(chunks(), out_csv)
     if rows_written == 0:
         raise RuntimeError("No observations parsed; CSV not written.")
     print(f"Wrote {rows_written:,} rows to {out_csv}")
@@ -419,28 +853,22 @@ def export_mirror_to_csv_labeled(
     raw_dir: Path,
     out_csv: Path = Path("un_mirror/normalized/energy_obs_labeled.csv"),
     cfg: UNDataConfig = CFG,
+    max_workers: Optional[int] = None,
 ) -> None:
     """
     Writes a CSV with Series + Obs attributes plus human-readable labels and scaled values.
     """
     files = sorted(raw_dir.glob("*.xml"))
     _ensure_parent(out_csv)
-    if out_csv.exists():
-        out_csv.unlink()
-
     label_maps = build_energy_codelists(cfg)
 
-    rows_written = 0
-    for i, f in enumerate(files, start=1):
-        df = parse_structurespecific_with_series(f)
-        if not df.empty:
-            df["__source_file"] = f.name
-            df = _enrich_labels_and_numeric(df, label_maps)
-            df.to_csv(out_csv, mode="a", header=not out_csv.exists(), index=False)
-            rows_written += len(df)
-        if i % 100 == 0:
-            print(f"csv labeled: processed {i}/{len(files)} files")
+    def chunks() -> Iterator[pd.DataFrame]:
+        for i, df in enumerate(_iter_parsed_mirror(files, label_maps, max_workers), start=1):
+            yield df
+            if i % 100 == 0:
+                print(f"csv labeled: processed {i}/{len(files)} files")
 
+    rows_written = _write_csv_stream(chunks(), out_csv)
     if rows_written == 0:
         raise RuntimeError("No observations parsed; CSV not written.")
     print(f"Wrote {rows_written:,} rows to {out_csv}")
@@ -449,6 +877,7 @@ def normalize_mirror_to_parquet_labeled(
     raw_dir: Path,
     out_parquet: Path = Path("un_mirror/normalized/energy_obs_labeled.parquet"),
     cfg: UNDataConfig = CFG,
+    max_workers: Optional[int] = None,
 ) -> None:
     """
     Parquet export with Series + Obs attributes, labels, and scaled values.
@@ -457,22 +886,84 @@ def normalize_mirror_to_parquet_labeled(
     _ensure_parent(out_parquet)
     label_maps = build_energy_codelists(cfg)
 
-    chunks = []
-    for i, f in enumerate(files, start=1):
-        df = parse_structurespecific_with_series(f)
-        if not df.empty:
-            df["__source_file"] = f.name
-            df = _enrich_labels_and_numeric(df, label_maps)
-            chunks.append(df)
-        if i % 100 == 0:
-            print(f"parquet labeled: parsed {i}/{len(files)}")
+    def chunks() -> Iterator[pd.DataFrame]:
+        for i, df in enumerate(_iter_parsed_mirror(files, label_maps, max_workers), start=1):
+            yield df
+            if i % 100 == 0:
+                print(f"parquet labeled: parsed {i}/{len(files)}")
 
-    if not chunks:
+    rows_written = _write_parquet_stream(chunks(), out_parquet)
+    if rows_written == 0:
         raise RuntimeError("No observations parsed. Keep raw XML and use an SDMX parser library instead.")
+    print(f"Wrote {rows_written:,} rows to {out_parquet}")
 
-    out = pd.concat(chunks, ignore_index=True)
-    out.to_parquet(out_parquet, index=False)
-    print(f"Wrote {len(out):,} rows to {out_parquet}")
+def dataset_partitioning():
+    """
+    Hive partitioning (REF_AREA as string, year as int16) used by the partitioned export.
+    Pass it to pyarrow.dataset.dataset(...) when reading so "004" stays a string key.
+    """
+    return pa_dataset.partitioning(
+        pa.schema([("REF_AREA", pa.string()), ("year", pa.int16())]), flavor="hive"
+    )
+
+def _write_mirror_partition(out_dir: Path, xml_path: Path) -> int:
+    """
+    Worker: parses one XML slice and writes it into the hive-partitioned dataset under
+    `out_dir`. File names derive from the slice, so workers never collide.
+    """
+    df = _parse_mirror_file(xml_path)
+    if df.empty:
+        return 0
+    year = pd.to_numeric(df["TIME_PERIOD"], errors="coerce").astype("Int16")
+    table = next(_iter_arrow_tables([df])).append_column("year", pa.array(year, type=pa.int16()))
+    pa_dataset.write_dataset(
+        table,
+        base_dir=str(out_dir),
+        format="parquet",
+        partitioning=dataset_partitioning(),
+        basename_template=f"{xml_path.stem}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(df)
+
+def normalize_mirror_to_parquet_dataset(
+    raw_dir: Path,
+    out_dir: Path = Path("un_mirror/normalized/energy_obs_labeled"),
+    cfg: UNDataConfig = CFG,
+    max_workers: Optional[int] = None,
+) -> None:
+    """
+    Labeled Parquet export as a dataset partitioned by REF_AREA and year (hive layout), so
+    readers can prune with pyarrow.dataset filters (see dataset_partitioning). Each worker
+    writes its own files; `out_dir` is replaced on every run, and only if it holds nothing
+    but REF_AREA=* partition directories (a mistyped path is never wiped).
+    """
+    if pa_dataset is None:
+        raise RuntimeError("pyarrow is required for the partitioned Parquet export.")
+    files = sorted(raw_dir.glob("*.xml"))
+    if out_dir.exists():
+        foreign = [
+            p.name for p in out_dir.iterdir() if not (p.is_dir() and p.name.startswith("REF_AREA="))
+        ]
+        if foreign:
+            raise RuntimeError(
+                f"Refusing to replace {out_dir}: it holds more than a REF_AREA=* dataset "
+                f"({', '.join(sorted(foreign)[:5])})."
+            )
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+    label_maps = build_energy_codelists(cfg)
+
+    worker = partial(_write_mirror_partition, out_dir)
+    rows_written = 0
+    for i, rows in enumerate(_iter_parsed_mirror(files, label_maps, max_workers, worker), start=1):
+        rows_written += rows
+        if i % 100 == 0:
+            print(f"parquet dataset: processed {i}/{len(files)} files")
+
+    if rows_written == 0:
+        raise RuntimeError("No observations parsed. Keep raw XML and use an SDMX parser library instead.")
+    print(f"Wrote {rows_written:,} rows to {out_dir}")
 
 #%% run
 # Mirror everything (choose years relevant to you)
@@ -483,6 +974,7 @@ if __name__ == "__main__":
     # Then (optional) normalize for fast filtering
     # normalize_mirror_to_parquet(CFG.out_raw_dir)
     # normalize_mirror_to_parquet_labeled(CFG.out_raw_dir)
+    # normalize_mirror_to_parquet_dataset(CFG.out_raw_dir)  # partitioned by REF_AREA/year
 
     # Or (optional) write one big CSV (slower, larger)
     # export_mirror_to_csv(CFG.out_raw_dir, Path("un_mirror/normalized/energy_obs.csv"))
@@ -222,8 +222,8 @@ def is_production_dropped(label: str) -> bool:
 
 
 def is_production_kept(label: str) -> bool:
-    key = label.strip().lower()
-    return key in PRIMARY_PRODUCTION_LABELS_KEEP and not is_production_dropped(label)
+    # The keep set already excludes PRODUCTION_DROP_LABELS, so one normalized lookup suffices
+    return label.strip().lower() in PRIMARY_PRODUCTION_LABELS_KEEP
 
 
 def write_chart_meta(path: str | Path) -> None:
@@ -13,32 +13,131 @@ Examples:
 from __future__ import annotations
 
 import argparse
+import json
+import logging
 import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
+import create_energy_assets as prep
 from create_energy_assets import run_workflow
+import combine_un_ei
 from combine_un_ei import combine_un_with_ei
 
+logger = logging.getLogger("energy_prep")
+
+# Compiled UN-only shard pattern per output name, built once per process
+_SHARD_RE_CACHE: Dict[str, re.Pattern] = {}
+
+# Prep code whose edits invalidate the output stamps
+_SCRIPT_FILES = tuple(
+    Path(__file__).with_name(name)
+    for name in ("create_energy_assets.py", "mappings.py", "combine_un_ei.py", "run_energy_prep.py")
+)
+
+
+@contextmanager
+def _prep_logging() -> Iterator[None]:
+    """
+    Attach a stdout handler to the energy_prep logger for the duration of main().
+    Records are written synchronously to the same stdout the callees print to, so
+    console order is kept, and propagation to the root logger is switched off so
+    a configured root handler (e.g. in notebooks) does not emit them twice.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    previous = (logger.level, logger.propagate)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        yield
+    finally:
+        logger.removeHandler(handler)
+        logger.level, logger.propagate = previous
+
 
 def _delete_un_only_outputs(un_output: Path) -> None:
     """
     Remove UN-only JSON, index, and shards after a successful UN+EI build.
+    One directory scan; shards are <stem>-<year>-g<n>.json plus their .ndjson
+    copies. Unlike the old <stem>-*-g*.json glob this leaves the UN+EI shards
+    (<stem>-ei-<year>-g<n>.json) in place: they were just written and the UN+EI
+    index points at them. Stale UN+EI shards are cleared by combine_un_with_ei's
+    own shard writer.
+    """
+    exact = {un_output.name, f"{un_output.stem}.index.json"}
+    shard_re = _SHARD_RE_CACHE.get(un_output.name)
+    if shard_re is None:
+        shard_re = _SHARD_RE_CACHE[un_output.name] = re.compile(
+            rf"{re.escape(un_output.stem)}-\d+-g\d+(?:{re.escape(un_output.suffix)}|\.ndjson)"
+        )
+    try:
+        with os.scandir(un_output.parent) as entries:
+            for entry in entries:
+                name = entry.name
+                if name not in exact and not shard_re.fullmatch(name):
+                    continue
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    except FileNotFoundError:
+        return
+    except OSError as exc:  # pragma: no cover - runtime guard
+        logger.warning("Failed to delete UN-only files: %s", exc)
+
+
+def _stamp_key(outputs: List[Path], inputs: List[Path], options: Dict) -> Optional[str]:
     """
-    un_path = un_output
-    un_index = un_path.with_name(f"{un_path.stem}.index.json")
-    shard_glob = f"{un_path.stem}-*-g*.json"
+    Build key for a prep step: its options plus mtime_ns/size of every input, output
+    and prep script. None when any of those files is missing.
+    """
+    files = {}
+    try:
+        for path in (*inputs, *outputs, *_SCRIPT_FILES):
+            st = path.stat()
+            files[str(path)] = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+    return json.dumps({"options": options, "files": files}, sort_keys=True)
+
+
+def _stamp_path(output: Path) -> Path:
+    return output.with_name(output.name + ".stamp")
+
+
+def _is_current(outputs: List[Path], inputs: List[Path], options: Dict) -> bool:
+    """
+    True when the stamp next to the first output matches the current build key.
+    """
+    key = _stamp_key(outputs, inputs, options)
+    if key is None:
+        return False
+    try:
+        return _stamp_path(outputs[0]).read_text(encoding="utf-8") == key
+    except OSError:
+        return False
+
+
+def _write_stamp(outputs: List[Path], inputs: List[Path], options: Dict) -> None:
+    key = _stamp_key(outputs, inputs, options)
+    if key is None:
+        return
     try:
-        if un_path.exists():
-            un_path.unlink()
-        if un_index.exists():
-            un_index.unlink()
-        for shard in un_path.parent.glob(shard_glob):
-            shard.unlink(missing_ok=True)
+        _stamp_path(outputs[0]).write_text(key, encoding="utf-8")
     except OSError as exc:  # pragma: no cover - runtime guard
-        print(f"[WARN] Failed to delete UN-only files: {exc}")
+        logger.warning("Failed to write build stamp: %s", exc)
 
 
-def main() -> None:
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    CLI for main(); built once at import as _PARSER.
+    """
     parser = argparse.ArgumentParser(description="Prepare APEC/UN energy datasets.")
     parser.add_argument(
         "--apec-input",
@@ -58,7 +157,7 @@ def main() -> None:
     parser.add_argument(
         "--un-output-json",
         default="public/data/energy-profiles-un.json",
-        help="UN output JSON path.",
+        help="UN output JSON path (only written with --keep-un-only).",
     )
     parser.add_argument(
         "--un-ei-output-json",
@@ -93,31 +192,134 @@ def main() -> None:
         action="store_true",
         help="Skip chart generation for APEC output.",
     )
-    args = parser.parse_args()
-
-    apec_count, un_count = run_workflow(
-        apec_input=args.apec_input,
-        un_input=args.un_input,
-        output_json=args.output_json,
-        un_output_json=args.un_output_json,
-        charts_dir="public/energy-graphs",
-        apec_default_year=args.year,
-        scenario=args.scenario,
-        un_years=args.un_years,
-        skip_charts=args.skip_charts,
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always re-read the APEC/UN/EI inputs instead of their .parquet caches.",
+    )
+    parser.add_argument(
+        "--excel-engine",
+        choices=["calamine", "openpyxl"],
+        default=prep.EXCEL_ENGINE,
+        help="Excel reader for the APEC/EI workbooks (default: calamine when python-calamine is installed).",
+    )
+    parser.add_argument(
+        "--keep-un-only",
+        action="store_true",
+        help="Also write and keep the UN-only JSON/shards (UN+EI is otherwise built in memory).",
     )
-    print(f"APEC profiles: {apec_count}, UN profiles: {un_count}")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild APEC and UN+EI (and every chart) even when their build stamps match.",
+    )
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        help="Run the APEC and UN branches one after the other in this process (for debugging).",
+    )
+    return parser
 
-    # Always produce UN+EI electricity overlay (drops economies without EI data)
-    try:
-        combine_un_with_ei(
-            Path(args.un_output_json),
-            Path(args.ei_workbook),
-            Path(args.un_ei_output_json),
+
+_PARSER = _build_parser()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the prep pipeline; argv defaults to sys.argv[1:] (pass a list to call it in-process).
+    """
+    args = _PARSER.parse_args(argv)
+    if args.excel_engine == "calamine" and prep.EXCEL_ENGINE != "calamine":
+        _PARSER.error("--excel-engine calamine requires the python-calamine package.")
+    # Read at call time by the APEC and EI loaders
+    prep.EXCEL_ENGINE = args.excel_engine
+    un_out = Path(args.un_output_json)
+    ei_wb = Path(args.ei_workbook)
+    un_ei_out = Path(args.un_ei_output_json)
+
+    with _prep_logging():
+        # Each output has a .stamp recording the options and input/script mtime_ns+size
+        # it was built from; --force rebuilds regardless
+        apec_in = prep._resolve_input(args.apec_input)
+        un_in = prep._resolve_input(args.un_input)
+        charts_dir = Path("public/energy-graphs")
+        apec_outputs = [Path(args.output_json)]
+        apec_inputs = [apec_in] if apec_in is not None else []
+        apec_options = {
+            "year": args.year,
+            "scenario": args.scenario,
+            "skip_charts": args.skip_charts,
+            "excel_engine": args.excel_engine,
+        }
+        un_outputs = [un_ei_out, un_out] if args.keep_un_only else [un_ei_out]
+        un_inputs = [un_in, ei_wb] if un_in is not None else []
+        un_options = {
+            "scenario": args.scenario,
+            "un_years": args.un_years,
+            "keep_un_only": args.keep_un_only,
+            "excel_engine": args.excel_engine,
+        }
+        skip_apec = (
+            not args.force
+            and apec_in is not None
+            and _is_current(apec_outputs, apec_inputs, apec_options)
+            # Charts (Excel input only) are not stamped; re-run when they are wanted but gone
+            and (args.skip_charts or apec_in.suffix.lower() == ".csv" or charts_dir.is_dir())
+        )
+        skip_un = (
+            not args.force
+            and un_in is not None
+            and _is_current(un_outputs, un_inputs, un_options)
+        )
+        if skip_apec:
+            logger.info("APEC output up to date, skipping (use --force to rebuild)")
+        if skip_un:
+            logger.info("UN+EI output up to date, skipping (use --force to rebuild)")
+        if skip_apec and skip_un:
+            return
+
+        # Parse the EI sheet in the background while APEC/UN run; read errors surface in combine
+        ei_pool = ThreadPoolExecutor(max_workers=1)
+        ei_future = None if skip_un else ei_pool.submit(
+            combine_un_ei._load_ei_sheet, ei_wb, use_cache=not args.no_cache
         )
-        _delete_un_only_outputs(Path(args.un_output_json))
-    except Exception as exc:  # pragma: no cover - runtime guard
-        print(f"[WARN] Failed to combine UN with EI electricity: {exc}")
+
+        def _combine_un_ei(un_obj: Optional[dict]) -> None:
+            # Always produce UN+EI electricity overlay (drops economies without EI data)
+            try:
+                combine_un_with_ei(
+                    un_obj if un_obj is not None else un_out,
+                    ei_future.result(),
+                    un_ei_out,
+                )
+                if not args.keep_un_only:
+                    # Nothing UN-only was written this run; this only clears earlier leftovers
+                    _delete_un_only_outputs(un_out)
+                _write_stamp(un_outputs, un_inputs, un_options)
+            except Exception as exc:  # pragma: no cover - runtime guard
+                logger.warning("Failed to combine UN with EI electricity: %s", exc)
+
+        # UN+EI starts as soon as the UN branch finishes, overlapping APEC when parallel
+        with ei_pool:
+            apec_count, un_count = run_workflow(
+                apec_input=None if skip_apec else args.apec_input,
+                un_input=None if skip_un else args.un_input,
+                output_json=args.output_json,
+                un_output_json=un_out,
+                charts_dir=str(charts_dir),
+                apec_default_year=args.year,
+                scenario=args.scenario,
+                un_years=args.un_years,
+                skip_charts=args.skip_charts,
+                use_cache=not args.no_cache,
+                force_charts=args.force,
+                parallel=not args.serial,
+                on_un_done=_combine_un_ei,
+                write_un_json=args.keep_un_only,
+            )
+            logger.info("APEC profiles: %d, UN profiles: %d", apec_count, un_count)
+        if not skip_apec and apec_count:
+            _write_stamp(apec_outputs, apec_inputs, apec_options)
 
 
 def run_energy_prep_notebook(
@@ -150,8 +352,9 @@ def run_energy_prep_notebook(
         apec_years=apec_years,
         skip_charts=skip_charts,
     )
-    combine_un_with_ei(Path(un_output), Path(ei_workbook), Path(un_ei_output))
-    _delete_un_only_outputs(Path(un_output))
+    un_output_path = Path(un_output)
+    combine_un_with_ei(un_output_path, Path(ei_workbook), Path(un_ei_output))
+    _delete_un_only_outputs(un_output_path)
     return apec_count, un_count
 
 